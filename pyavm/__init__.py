@@ -1,2 +1,3 @@
 from ._version import __version__ as __version__
-from .avm import AVM, NoAVMPresent  # noqa: F401
+from .avm import AVM, NoAVMPresent, convert_version  # noqa: F401
+from .record import AVMRecord  # noqa: F401
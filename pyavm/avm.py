@@ -44,8 +44,9 @@ class NoSpatialInformation(Exception):
     pass
 
 
-from .embed import embed_xmp
+from .embed import embed_xmp, update_xmp, xpacket_padding
 from .extract import extract_xmp
+from .io_utils import is_filename
 
 # Define namespace to tag mapping
 
@@ -92,13 +93,46 @@ def auto_type(string):
             return string
 
 
+def _may_be_unset(content):
+    # Return whether a value read from an XMP packet may be converted to
+    # None, in which case it is converted straight away when reading lazily
+    # so that the tag is not counted as set
+    if isinstance(content, str):
+        return not content.strip()
+    elif isinstance(content, list):
+        return not any(content)
+    else:
+        return content is None
+
+
+class _Raw:
+    """
+    A value read from an XMP packet that is only validated and converted by
+    ``avm_class`` when it is first accessed.
+    """
+
+    __slots__ = ("raw", "avm_class")
+
+    def __init__(self, raw, avm_class):
+        self.raw = raw
+        self.avm_class = avm_class
+
+    def resolve(self):
+        return self.avm_class.check_data(self.raw)
+
+
 class AVMContainer:
+    # Groups that can have a value (such as Distance) store it in _value,
+    # which is left unset for other groups so that hasattr(item, "value")
+    # can be used to tell them apart
+    __slots__ = ("_items", "_parent", "_name", "_value")
+
     def __init__(self, allow_value=False, parent=None, name=None):
-        if allow_value:
-            self.value = None
         self._items = {}
         self._parent = parent
         self._name = name
+        if allow_value:
+            self.value = None
 
     def __str__(self, indent=0):
         string = ""
@@ -115,22 +149,33 @@ class AVMContainer:
                         string += " " * indent + f"{family}:\n"
                     string += substring
             else:
-                if isinstance(self._items[family], list):
+                value = self._get(family)
+                if isinstance(value, list):
                     string += " " * indent + f"{family}:\n"
-                    for elem in self._items[family]:
+                    for elem in value:
                         if elem is not None:
                             string += " " * indent + f"   * {utf8(elem)}\n"
                 else:
-                    if self._items[family] is not None:
-                        string += " " * indent + f"{family}: {utf8(self._items[family])}\n"
+                    if value is not None:
+                        string += " " * indent + f"{family}: {utf8(value)}\n"
 
         return string
 
     def __repr__(self):
         return self.__str__()
 
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        self._count_set((value is not None) - (getattr(self, "_value", None) is not None))
+        object.__setattr__(self, "_value", value)
+        self._changed()
+
     def __setattr__(self, attribute, value):
-        if attribute in ["_items", "value", "_parent", "_name"]:
+        if attribute in ["_items", "value", "_parent", "_name", "_value"]:
             object.__setattr__(self, attribute, value)
             return
         if attribute not in self._items:
@@ -143,54 +188,248 @@ class AVMContainer:
                 avm_class = self._parent._specs[full_name]
                 value = avm_class.check_data(value)
 
-        self._items[attribute] = value
+        self._set_item(attribute, value)
+        self._changed()
+
+    def _changed(self):
+        # Called when a value is changed, to clear cached serializations
+        parent = self._parent
+        if parent is not None:
+            parent._changed()
+
+    def _set_item(self, attribute, value):
+        # Set the value of a tag, keeping count of the tags that are set
+        items = self._items
+        delta = (value is not None) - (items.get(attribute) is not None)
+        items[attribute] = value
+        if delta:
+            self._count_set(delta)
+
+    def _count_set(self, delta):
+        # Called when the number of tags set changes, to update the counts
+        # kept by the parent
+        parent = self._parent
+        if parent is not None and delta:
+            parent._count_group(self._name, delta)
+
+    def _get(self, attribute):
+        # Return the value of a tag, validating it first if needed
+        value = self._items[attribute]
+        if isinstance(value, _Raw):
+            value = value.resolve()
+            self._set_item(attribute, value)
+        return value
 
     def __getattr__(self, attribute):
         if attribute in self._items:
-            return self._items[attribute]
+            return self._get(attribute)
         else:
             return object.__getattr__(self, attribute)
 
 
-def parse_avm_content(rdf):
-    avm_content = {}
+class _Tag:
+    """
+    A tag in the classes generated for each version of the standard (see
+    AVM._classes), which validates values with ``check_data`` when they are
+    set.
+    """
 
-    for item in rdf.attrib:
-        # Find URI
-        uri, tag = item[1:].split("}")
+    __slots__ = ("name", "check_data")
 
-        if uri in namespaces:
-            avm_content[(namespaces[uri], tag)] = rdf.attrib[item]
+    def __init__(self, name, check_data):
+        self.name = name
+        self.check_data = check_data
 
-    for item in rdf:
-        # Find URI
-        uri, tag = item.tag[1:].split("}")
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance._items[self.name]
+        if isinstance(value, _Raw):
+            value = instance._get(self.name)
+        return value
+
+    def __set__(self, instance, value):
+        instance._set_item(self.name, self.check_data(value))
+        instance._changed()
+
+
+class _Group:
+    """
+    A group in the classes generated for each version of the standard. For
+    groups that can have a value, ``check_data`` is used to validate values
+    set on the group itself.
+    """
+
+    __slots__ = ("name", "check_data")
+
+    def __init__(self, name, check_data=None):
+        self.name = name
+        self.check_data = check_data
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance._items[self.name]
+
+    def __set__(self, instance, value):
+        if self.check_data is None:
+            raise AttributeError(f"{self.name} is an AVM group, not a tag")
+        instance._items[self.name].value = self.check_data(value)
+
+
+def _generated_setattr(self, attribute, value):
+    # Tags and groups are set through their descriptors, and other names are
+    # left to the original classes, which give the errors for unknown tags
+    if attribute in self._descriptors:
+        object.__setattr__(self, attribute, value)
+    else:
+        super(type(self), self).__setattr__(attribute, value)
+
+
+def _generated_namespace(descriptors):
+    # Return the namespace for a class generated by AVM._classes
+    return {
+        "__slots__": (),
+        "__setattr__": _generated_setattr,
+        "_descriptors": frozenset(descriptors),
+        **descriptors,
+    }
+
+
+class _Undefined:
+    """
+    A tag or group which is defined in other versions of the standard, but
+    not in the version of the class it is in. This falls back to the checks
+    done by the original classes.
+    """
+
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        # Groups are kept when changing version, so may still be present
+        return instance.__getattr__(self.name)
+
+    def __set__(self, instance, value):
+        super(type(instance), instance).__setattr__(self.name, value)
+
+
+RDF_NAMESPACE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+# Namespaces used in XMP packets, which are also registered with
+# ElementTree so that elements created by the datatypes use these prefixes
 
-        if uri == "http://www.w3.org/1999/02/22-rdf-syntax-ns#":
-            sub_avm_content = parse_avm_content(item)
-            for key in sub_avm_content:
-                avm_content[key] = sub_avm_content[key]
+_XMP_NAMESPACES = {"x": "adobe:ns:meta/", "rdf": RDF_NAMESPACE, **reverse_namespaces}
+
+for _prefix, _uri in _XMP_NAMESPACES.items():
+    register_namespace(_prefix, _uri)
+
+_NAMESPACE_DECLARATIONS = {
+    prefix: f' xmlns:{prefix}="{uri}"'.encode("utf-8") for prefix, uri in _XMP_NAMESPACES.items()
+}
+
+
+# Mapping from the element and attribute names used by ElementTree to the
+# keys used in the AVM content. Names in the RDF namespace map to RDF, and
+# names in other namespaces to None. The table is pre-filled with the names
+# in the specifications, and other names are added as they are encountered.
+
+RDF = object()
+
+_CONTENT_NAMES = {}
+
+for _specs in REVERSE_SPECS.values():
+    for _prefix, _tag in _specs:
+        _CONTENT_NAMES[f"{{{reverse_namespaces[_prefix]}}}{_tag}"] = (_prefix, _tag)
+
+_LIST_NAMES = frozenset(f"{{{RDF_NAMESPACE}}}{tag}" for tag in ("Bag", "Seq", "Alt"))
+
+
+def _content_name(name):
+    try:
+        return _CONTENT_NAMES[name]
+    except KeyError:
+        uri, _, tag = name[1:].partition("}")
+        if not tag:
+            value = None
+        elif uri == RDF_NAMESPACE:
+            value = RDF
         elif uri in namespaces:
+            value = (namespaces[uri], tag)
+        else:
+            value = None
+        # Limit the size of the table in case of files with many unknown names
+        if len(_CONTENT_NAMES) < 10000:
+            _CONTENT_NAMES[name] = value
+        return value
+
+
+def parse_avm_content(rdf, avm_content=None, keys=None):
+    """
+    Extract the AVM content from an RDF element, as a dictionary mapping
+    ``(prefix, tag)`` keys to values.
+
+    If ``keys`` is given, it should be a set of the keys to extract. Other
+    elements are skipped, and keys are removed from the set as they are
+    found, so that parsing stops once the set is empty.
+    """
+
+    if avm_content is None:
+        avm_content = {}
+
+    for name, value in rdf.attrib.items():
+        key = _content_name(name)
+        if key is not None and key is not RDF:
+            if keys is not None:
+                if key not in keys:
+                    continue
+                keys.discard(key)
+            avm_content[key] = value
+
+    for item in rdf:
+        if keys is not None and not keys:
+            break
+        key = _content_name(item.tag)
+        if key is RDF:
+            parse_avm_content(item, avm_content, keys)
+        elif key is not None:
+            if len(item) > 1:
+                parse_avm_content(item, avm_content, keys)
+                continue
+            if keys is not None:
+                if key not in keys:
+                    continue
+                keys.discard(key)
             if len(item) == 0:
-                avm_content[(namespaces[uri], tag)] = item.text
-            elif len(item) == 1:
-                c_uri, c_tag = item[0].tag[1:].split("}")
-                if c_uri == "http://www.w3.org/1999/02/22-rdf-syntax-ns#" and c_tag in [
-                    "Bag",
-                    "Seq",
-                    "Alt",
-                ]:
-                    avm_content[(namespaces[uri], tag)] = [x.text for x in item[0]]
-                else:
-                    raise ValueError(f"Unexpected tag {c_uri}:{c_tag}")
-            elif len(item) > 1:
-                sub_avm_content = parse_avm_content(item)
-                for key in sub_avm_content:
-                    avm_content[key] = sub_avm_content[key]
+                avm_content[key] = item.text
+            elif item[0].tag in _LIST_NAMES:
+                avm_content[key] = [x.text for x in item[0]]
+            else:
+                c_uri, _, c_tag = item[0].tag[1:].partition("}")
+                raise ValueError(f"Unexpected tag {c_uri}:{c_tag}")
 
     return avm_content
 
 
+# Layout of the tags and groups for each version of the standard (see
+# AVM._schema)
+
+_SCHEMAS = {}
+
+# Changes to the layout between versions of the standard (see
+# AVM._version_diff)
+
+_VERSION_DIFFS = {}
+
+# Classes generated for each version of the standard (see AVM._classes)
+
+_CLASSES = {}
+
+
 class AVM(AVMContainer):
     """
     There are several ways to initialize an AVM object:
@@ -236,15 +475,118 @@ class AVM(AVMContainer):
 
         >>> avm.embed('original_image.jpg', 'tagged_image.jpg')
 
-    At this time, only JPG and PNG files are supported.
+    JPEG, PNG, TIFF (including BigTIFF), WebP, HEIF/AVIF, and JPEG XL files
+    are supported.
     """
 
+    # The XML cached by to_xml until a tag is changed (along with copies of
+    # the lists it was created from, see to_xml), the version of the
+    # standard for which the tags and groups were created, the number of
+    # tags set in each group (see _recount), and whether values may not have
+    # been validated (see from_xml)
+    __slots__ = ("_xml", "_layout", "_counts", "_total", "_unvalidated")
+
     def __init__(self, origin=None, version=1.2):
-        self._items = {}
+        self._items = {"MetadataVersion": version}
+        object.__setattr__(self, "_xml", None)
+        object.__setattr__(self, "_layout", version)
+        object.__setattr__(self, "_unvalidated", False)
+        avm_class, group_classes = self._classes(version)
+
+        # Number of tags set in each group (with None for tags outside
+        # groups), and in total
+        count = int(version is not None)
+        object.__setattr__(self, "_counts", {None: count})
+        object.__setattr__(self, "_total", count)
+
+        # Create the tags and groups from the layout for this version
+        for name, layout in self._schema(version):
+            if layout is None:
+                self._items[name] = None
+            else:
+                # This is equivalent to creating an AVMContainer and
+                # setting its items, but avoids going through __setattr__
+                allow_value, keys = layout
+                container = object.__new__(group_classes[name])
+                container._items = dict.fromkeys(keys)
+                container._parent = self
+                container._name = name
+                if allow_value:
+                    container._value = None
+                self._items[name] = container
+
+        object.__setattr__(self, "__class__", avm_class)
 
-        self.MetadataVersion = version
+    @classmethod
+    def _schema(cls, version):
+        # Return the layout of the tags and groups for a version of the
+        # standard, as a tuple of (name, layout) pairs where layout is None
+        # for tags, and (allow_value, keys) for groups. This is found once
+        # for each version using _update_attributes.
+        if version not in _SCHEMAS:
+            prototype = object.__new__(cls)
+            object.__setattr__(prototype, "_items", {"MetadataVersion": version})
+            prototype._update_attributes()
+            _SCHEMAS[version] = tuple(
+                (name, (hasattr(item, "value"), tuple(item._items)))
+                if isinstance(item, AVMContainer)
+                else (name, None)
+                for name, item in prototype._items.items()
+                if name != "MetadataVersion"
+            )
+        return _SCHEMAS[version]
 
-        self._update_attributes()
+    @classmethod
+    def _classes(cls, version):
+        # Return a subclass of the AVM class and subclasses of AVMContainer
+        # for each group for a version of the standard, in which the tags
+        # and groups are descriptors, so that they can be accessed without
+        # going through __getattr__ or looking up the specs. These have the same
+        # layout as the original classes, so objects can be switched
+        # between them when the version changes.
+        cls = cls.__dict__.get("_origin", cls)
+        if (cls, version) not in _CLASSES:
+            specs = SPECS[version]
+            attributes = {}
+            group_attributes = {}
+            for name, layout in cls._schema(version):
+                if layout is None:
+                    attributes[name] = _Tag(name, specs[name].check_data)
+                    continue
+                allow_value, keys = layout
+                attributes[name] = _Group(name, specs[name].check_data if allow_value else None)
+                group_attributes[name] = {
+                    key: _Tag(key, specs[f"{name}.{key}"].check_data) for key in keys
+                }
+            for other in SPECS.values():
+                for avm_name in other:
+                    name, _, key = avm_name.partition(".")
+                    if name == "MetadataVersion":
+                        continue
+                    attributes.setdefault(name, _Undefined(name))
+                    if key and name in group_attributes:
+                        group_attributes[name].setdefault(key, _Undefined(key))
+            group_classes = {
+                name: type(name, (AVMContainer,), _generated_namespace(group_attributes[name]))
+                for name in group_attributes
+            }
+            namespace = _generated_namespace(attributes)
+            namespace.update(__module__=cls.__module__, __qualname__=cls.__qualname__, _origin=cls)
+            _CLASSES[cls, version] = type(cls.__name__, (cls,), namespace), group_classes
+        return _CLASSES[cls, version]
+
+    def _switch_classes(self):
+        # Switch the object and its groups to the classes for its version.
+        # Objects read from XML can have a version that is not supported,
+        # in which case the classes for the layout are used.
+        version = self.MetadataVersion
+        if version not in SPECS:
+            version = self._layout
+        avm_class, group_classes = self._classes(version)
+        for name, item in self._items.items():
+            if isinstance(item, AVMContainer):
+                object.__setattr__(item, "__class__", group_classes.get(name, AVMContainer))
+        object.__setattr__(self, "__class__", avm_class)
 
     def _update_attributes(self):
         # Remove attributes that are no longer in the specs
@@ -304,6 +646,28 @@ class AVM(AVMContainer):
                     if key not in self._items[family]._items:
                         self._items[family]._items[key] = None
 
+        self._recount()
+
+    def _recount(self):
+        # Count the tags that are set in each group from scratch
+        counts = {None: 0}
+        for name, item in self._items.items():
+            if isinstance(item, AVMContainer):
+                counts[name] = sum(value is not None for value in item._items.values())
+                counts[name] += getattr(item, "_value", None) is not None
+            elif item is not None:
+                counts[None] += 1
+        object.__setattr__(self, "_counts", counts)
+        object.__setattr__(self, "_total", sum(counts.values()))
+
+    def _count_group(self, name, delta):
+        counts = self._counts
+        counts[name] = counts.get(name, 0) + delta
+        object.__setattr__(self, "_total", self._total + delta)
+
+    def _count_set(self, delta):
+        self._count_group(None, delta)
+
     def __dir__(self):
         return list(self._items.keys())
 
@@ -317,7 +681,20 @@ class AVM(AVMContainer):
 
     def __len__(self):
         """Return the number of tags with values set."""
-        return len(list(self.items()))
+        return self._total
+
+    def has_group(self, name):
+        """
+        Return whether any of the tags in a group are set.
+
+        Parameters
+        ----------
+        name : str
+            The name of the group, e.g. ``'Spatial'``.
+        """
+        if not isinstance(self._items.get(name), AVMContainer):
+            raise ValueError(f"{name} is not an AVM group in the {self.MetadataVersion} standard")
+        return self._counts.get(name, 0) > 0
 
     def items(self):
         """Return an iterator over (tag_name, value) pairs for set tags.
@@ -325,16 +702,22 @@ class AVM(AVMContainer):
         Only tags with non-None values are included.
         Nested tags are yielded with dotted names (e.g., 'Spatial.Equinox').
         """
+        counts = self._counts
         for name, item in self._items.items():
             if isinstance(item, AVMContainer):
+                # Skip groups in which no tags are set
+                if not counts.get(name):
+                    continue
                 # Handle containers with a direct value (like Distance)
                 if hasattr(item, "value") and item.value is not None:
                     yield (name, item.value)
                 # Handle nested items
-                for key, value in item._items.items():
+                for key in item._items:
+                    value = item._get(key)
                     if value is not None:
                         yield (f"{name}.{key}", value)
             else:
+                item = self._get(name)
                 if item is not None:
                     yield (name, item)
 
@@ -352,8 +735,92 @@ class AVM(AVMContainer):
 
     @MetadataVersion.setter
     def MetadataVersion(self, value):
-        self._items["MetadataVersion"] = value
-        self._update_attributes()
+        if getattr(self, "_layout", None) is None:
+            self._items["MetadataVersion"] = value
+            self._update_attributes()
+        else:
+            diff = self._version_diff(self._layout, value)
+            self._set_item("MetadataVersion", value)
+            self._apply_version_diff(*diff)
+        object.__setattr__(self, "_layout", value)
+        self._switch_classes()
+        self._changed()
+
+    @classmethod
+    def _version_diff(cls, source, target):
+        # Return the changes needed to go from the layout for one version to
+        # the layout for another. This is a tuple of the removed tags, as
+        # (name, key) pairs where key is None for tags outside groups, and
+        # of the added tags and groups, as (name, key, layout) tuples in the
+        # order in which they are added (see _schema for the layout). These
+        # are found once for each pair of versions by applying
+        # _update_attributes to an empty prototype.
+        if (source, target) not in _VERSION_DIFFS:
+            prototype = cls(version=source)
+            before = {
+                name: tuple(item._items) if isinstance(item, AVMContainer) else None
+                for name, item in prototype._items.items()
+            }
+            prototype._items["MetadataVersion"] = target
+            prototype._update_attributes()
+
+            removed = []
+            for name, keys in before.items():
+                if keys is None:
+                    if name not in prototype._items:
+                        removed.append((name, None))
+                else:
+                    container = prototype._items[name]
+                    removed.extend((name, key) for key in keys if key not in container._items)
+
+            added = []
+            for name, item in prototype._items.items():
+                if isinstance(item, AVMContainer):
+                    if name not in before:
+                        added.append((name, None, (hasattr(item, "value"), ())))
+                    keys = before.get(name) or ()
+                    added.extend((name, key, None) for key in item._items if key not in keys)
+                elif name not in before:
+                    added.append((name, None, None))
+
+            _VERSION_DIFFS[source, target] = tuple(removed), tuple(added)
+
+        return _VERSION_DIFFS[source, target]
+
+    def _apply_version_diff(self, removed, added):
+        for name, key in removed:
+            if key is None:
+                full_name, value = name, self._items[name]
+            else:
+                full_name, value = f"{name}.{key}", self._items[name]._items[key]
+            if value is not None:
+                warnings.warn(
+                    f"{full_name} is not defined in format specification {self.MetadataVersion} and will be deleted"
+                )
+
+        for name, key in removed:
+            if key is None:
+                self._set_item(name, None)
+                self._items.pop(name)
+            else:
+                self._items[name]._set_item(key, None)
+                self._items[name]._items.pop(key)
+
+        # Groups are never removed, so may already be present if the object
+        # was converted from this version before
+        for name, key, layout in added:
+            if key is not None:
+                self._items[name]._items.setdefault(key, None)
+            elif name in self._items:
+                continue
+            elif layout is None:
+                self._items[name] = None
+            else:
+                allow_value, _ = layout
+                self._items[name] = AVMContainer(allow_value=allow_value, parent=self, name=name)
+
+    def _changed(self):
+        object.__setattr__(self, "_xml", None)
 
     def __setattr__(self, attribute, value):
         if attribute in ["_items", "MetadataVersion"]:
@@ -374,27 +841,56 @@ class AVM(AVMContainer):
             else:
                 raise AttributeError(f"{attribute} is an AVM group, not a tag")
         else:
-            self._items[attribute] = value
+            self._set_item(attribute, value)
+            self._changed()
 
     def __getattr__(self, attribute):
         if attribute in self._items:
-            return self._items[attribute]
+            return self._get(attribute)
         else:
             return object.__getattr__(self, attribute)
 
+    def _content_keys(self, tags):
+        # Find the keys in the AVM content for a list of tags and groups. The
+        # version is always included, since it determines the specifications.
+        metadata_version = self._specs["MetadataVersion"]
+        keys = {(metadata_version.namespace, metadata_version.tag)}
+        for name in tags:
+            found = False
+            for avm_name, avm_class in self._specs.items():
+                if avm_name == name or avm_name.startswith(name + "."):
+                    keys.add((avm_class.namespace, avm_class.tag))
+                    found = True
+            if not found:
+                raise ValueError(
+                    f"{name} is not a valid AVM group or tag in the {self.MetadataVersion} standard"
+                )
+        return keys
+
     @classmethod
-    def from_image(cls, filename, xmp_packet_index=None):
+    def from_image(cls, filename, xmp_packet_index=None, tags=None, lazy=False, validate=True):
         """
         Instantiate an AVM object from an existing image.
 
         Parameters
         ----------
-        filename : str
-            The filename of the image to read the AVM meta-data from
+        filename : str, file-like, bytes, or memoryview
+            The image to read the AVM meta-data from, given either as a
+            filename, a binary file object, or the contents of the image
         xmp_packet_index : int, optional
             In cases where multiple XMP packets are present in the file, this
             can be used to indicate which one to use. If not specified, this
             defaults to the first XMP packet found.
+        tags : iterable of str, optional
+            If specified, only these tags are read. Groups such as
+            ``'Spatial'`` can be given to read all the tags in the group.
+            Other tags are skipped without being validated.
+        lazy : bool, optional
+            If `True`, tags are only validated and converted when they are
+            first accessed, rather than when the image is read.
+        validate : bool, optional
+            If `False`, the values are stored without being validated or
+            converted (see :meth:`from_xml`).
         """
 
         # Get XMP data from file
@@ -407,7 +903,7 @@ class AVM(AVMContainer):
 
         # Extract XML
         xml = xmp[start:end]
-        return cls.from_xml(xml)
+        return cls.from_xml(xml, tags=tags, lazy=lazy, validate=validate)
 
     @classmethod
     def from_xml_file(cls, filename):
@@ -418,38 +914,101 @@ class AVM(AVMContainer):
             return cls.from_xml(f.read())
 
     @classmethod
-    def from_xml(cls, xml):
+    def from_xml(cls, xml, tags=None, lazy=False, validate=True):
         """
         Instantiate an AVM object from an XML string
+
+        Parameters
+        ----------
+        xml : bytes
+            The XML string
+        tags : iterable of str, optional
+            If specified, only these tags are read. Groups such as
+            ``'Spatial'`` can be given to read all the tags in the group.
+            Other tags are skipped without being validated.
+        lazy : bool, optional
+            If `True`, tags are only validated and converted when they are
+            first accessed, rather than when the XML is parsed. Invalid
+            values then raise an exception on access.
+        validate : bool, optional
+            If `False`, the values read from the XML are stored without being
+            validated or converted, which is faster for trusted input. In
+            this case :meth:`validate` should be called before the values
+            are used.
         """
 
         self = cls()
 
+        keys = None if tags is None else self._content_keys(tags)
+
         # Parse XML
         tree = et.parse(BytesIO(xml))
         root = tree.getroot()
-        avm_content = parse_avm_content(root)
+        avm_content = parse_avm_content(root, keys=keys)
+
+        specs = self._specs
+        reverse_specs = self._reverse_specs
 
         for tag, name in avm_content:
             content = avm_content[(tag, name)]
 
-            if (tag, name) in self._reverse_specs:
-                avm_name = self._reverse_specs[tag, name]
+            if (tag, name) in reverse_specs:
+                avm_name = reverse_specs[tag, name]
 
                 # Add to AVM dictionary
-                avm_class = self._specs[avm_name]
-                content = avm_class.check_data(content)
+                avm_class = specs[avm_name]
+                if avm_name == "MetadataVersion":
+                    # This is needed to find the specifications
+                    content = avm_class.check_data(content)
+                elif not validate:
+                    object.__setattr__(self, "_unvalidated", True)
+                elif (
+                    not lazy
+                    or _may_be_unset(content)
+                    or ("." not in avm_name and hasattr(self._items[avm_name], "value"))
+                ):
+                    content = avm_class.check_data(content)
+                else:
+                    content = _Raw(content, avm_class)
                 if "." in avm_name:
                     family, key = avm_name.split(".")
-                    self._items[family]._items[key] = content
+                    self._items[family]._set_item(key, content)
                 else:
                     if hasattr(self._items[avm_name], "value"):
                         self._items[avm_name].value = content
                     else:
-                        self._items[avm_name] = content
+                        self._set_item(avm_name, content)
+
+        if self.MetadataVersion != self._layout:
+            self._switch_classes()
 
         return self
 
+    def validate(self):
+        """
+        Validate and convert the values of all the tags.
+
+        This is needed for AVM objects read with ``validate=False``, and
+        raises an exception if any of the values are invalid.
+        """
+        for name, item in self._items.items():
+            if name == "MetadataVersion":
+                continue
+            if isinstance(item, AVMContainer):
+                if hasattr(item, "value") and item.value is not None:
+                    item.value = self._specs[name].check_data(item.value)
+                for key in item._items:
+                    value = item._get(key)
+                    if value is not None:
+                        item._set_item(key, self._specs[f"{name}.{key}"].check_data(value))
+            else:
+                value = self._get(name)
+                if value is not None:
+                    self._set_item(name, self._specs[name].check_data(value))
+
+        object.__setattr__(self, "_unvalidated", False)
+        self._changed()
+
     def to_wcs(self, use_full_header=False, target_image=None, target_shape=None):
         """
         Convert AVM projection information into a Astropy WCS object.
@@ -475,7 +1034,7 @@ class AVM(AVMContainer):
         if not astropy_installed:
             raise ImportError("Astropy is required to use to_wcs()")
 
-        if repr(self.Spatial) == "":
+        if not self.has_group("Spatial"):
             raise NoSpatialInformation("AVM meta-data does not contain any spatial information")
 
         if use_full_header and self.Spatial.FITSheader is not None:
@@ -686,73 +1245,198 @@ class AVM(AVMContainer):
     def to_xml(self):
         """
         Convert the AVM meta-data to an XML string
-        """
-
-        # Register namespaces
-        register_namespace("x", "adobe:ns:meta/")
-        register_namespace("rdf", "http://www.w3.org/1999/02/22-rdf-syntax-ns#")
-        for namespace in namespaces:
-            register_namespace(namespaces[namespace], namespace)
 
-        # Create containing structure
-        root = et.Element("{adobe:ns:meta/}xmpmeta")
-        trunk = et.SubElement(root, "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF")
-        branch = et.SubElement(trunk, "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description")
+        The meta-data is written using version 1.1 of the standard, so tags
+        that are not defined in that version are not included. This does not
+        change the AVM object, and the result is cached until a tag is set
+        or a list is changed in place.
 
-        self.MetadataVersion = 1.1
+        For objects read with ``validate=False``, the values are validated
+        as they are written, without changing the object, so invalid values
+        raise an exception here unless :meth:`validate` is called first.
+        """
 
-        # Write all the elements
+        # Lists can be changed in place without going through __setattr__, so
+        # the cached XML is only used if they are still equal to the copies
+        # made when it was created
+        if self._xml is not None:
+            xml, lists = self._xml
+            if all(value == copy for value, copy in lists):
+                return xml
+
+        # Serialize all the elements
+        specs = SPECS[1.1]
+        unvalidated = self._unvalidated
+        prefixes = {"x", "rdf"}
+        elements = []
+        lists = []
         for name in self._items:
-            if isinstance(self._items[name], AVMContainer):
-                for key in self._items[name]._items:
-                    if self._items[name]._items[key] is not None:
-                        if key == "value":
-                            avm_class = self._specs[name]
-                            avm_class.to_xml(branch, self._items[name].value)
-                        else:
-                            avm_class = self._specs[f"{name}.{key}"]
-                            avm_class.to_xml(branch, self._items[name]._items[key])
+            if name == "MetadataVersion":
+                values = [(name, 1.1)]
+            elif isinstance(self._items[name], AVMContainer):
+                container = self._items[name]
+                values = [(f"{name}.{key}", container._get(key)) for key in container._items]
             else:
-                if self._items[name] is not None and name in self._specs:
-                    avm_class = self._specs[name]
-                    avm_class.to_xml(branch, self._items[name])
-
-        # Create XML Tree
-        tree = et.ElementTree(root)
-
-        # Need to create a BytesIO object to write to
-        s = BytesIO()
-        tree.write(s, encoding="utf-8")
-
-        # Rewind and read the contents
-        s.seek(0)
-        xml_string = s.read()
+                values = [(name, self._get(name))]
+            for avm_name, value in values:
+                if value is None:
+                    continue
+                if avm_name not in specs:
+                    warnings.warn(
+                        f"{avm_name} is not defined in format specification 1.1 and will not be included in the XML"
+                    )
+                    continue
+                avm_class = specs[avm_name]
+                if isinstance(value, list):
+                    lists.append((value, value.copy()))
+                if unvalidated:
+                    value = avm_class.check_data(value)
+                    if value is None:
+                        continue
+                prefixes.add(avm_class.namespace)
+                elements.append(avm_class.serialize(value))
+
+        # Create the containing structure. This gives the same output as
+        # ElementTree, which declares the namespaces used on the root
+        # element, sorted by prefix.
+        declarations = b"".join(_NAMESPACE_DECLARATIONS[prefix] for prefix in sorted(prefixes))
+        if elements:
+            description = b"<rdf:Description>" + b"".join(elements) + b"</rdf:Description>"
+        else:
+            description = b"<rdf:Description />"
 
-        return xml_string
+        xml = b"<x:xmpmeta" + declarations + b"><rdf:RDF>" + description + b"</rdf:RDF></x:xmpmeta>"
+        object.__setattr__(self, "_xml", (xml, tuple(lists)))
+        return xml
 
-    def to_xmp(self):
+    def to_xmp(self, padding=0):
         """
         Convert the AVM meta-data to an XMP packet
+
+        Parameters
+        ----------
+        padding : int, optional
+            The number of bytes of whitespace padding to add at the end of the
+            packet. Padding allows the packet to later be replaced in place
+            by a larger one (see :meth:`update_in_place`).
         """
         packet = b'<?xpacket begin="\xef\xbb\xbf" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
         packet += self.to_xml()
+        packet += xpacket_padding(padding)
         packet += b'<?xpacket end="w"?>'
 
         return packet
 
-    def embed(self, filename_in, filename_out, verify=False):
+    def embed(self, filename_in, filename_out, verify=False, compression_threshold=None, padding=0):
         """
         Embed the AVM meta-data in an image file
-        """
 
-        # Embed XMP packet into file
-        embed_xmp(filename_in, filename_out, self.to_xmp())
+        Parameters
+        ----------
+        filename_in : str, file-like, bytes, or memoryview
+            The image to embed the AVM meta-data into, given either as a
+            filename, a binary file object, or the contents of the image
+        filename_out : str, file-like, or None
+            The filename of the resulting image, or a binary file object to
+            write it to. If `None`, the contents of the resulting image are
+            returned instead.
+        verify : bool, optional
+            Whether to verify the resulting image with PIL
+        compression_threshold : int, optional
+            For PNG files, XMP packets of at least this size (in bytes) are
+            compressed. By default, packets are not compressed.
+        padding : int, optional
+            The number of bytes of padding to include in the XMP packet, so
+            that the meta-data can later be updated in place with
+            :meth:`update_in_place`.
+
+        Returns
+        -------
+        contents : bytes or None
+            The contents of the resulting image if ``filename_out`` is `None`
+        """
 
-        # Verify file if needed
         if verify:
             try:
                 from PIL import Image
             except ImportError:
                 raise ImportError("PIL is required for the verify= option")
-            image = Image.open(filename_out)
-            image.verify()
+
+        if filename_out is not None and not is_filename(filename_out):
+            start = filename_out.tell()
+
+        # Embed XMP packet into file
+        contents = embed_xmp(
+            filename_in,
+            filename_out,
+            self.to_xmp(padding=padding),
+            compression_threshold=compression_threshold,
+        )
+
+        # Verify file if needed
+        if verify:
+            if filename_out is None:
+                Image.open(BytesIO(contents)).verify()
+            elif is_filename(filename_out):
+                Image.open(filename_out).verify()
+            else:
+                end = filename_out.tell()
+                filename_out.seek(start)
+                Image.open(filename_out).verify()
+                filename_out.seek(end)
+
+        return contents
+
+    def update_in_place(self, filename, padding=2048):
+        """
+        Update the AVM meta-data embedded in an image file.
+
+        If the file contains an XMP packet that is large enough (including
+        padding) to hold the new meta-data, only the packet is overwritten,
+        leaving the rest of the file untouched. Otherwise, the whole file is
+        rewritten as for :meth:`embed`, with ``padding`` bytes of padding
+        added to the packet so that future updates can be done in place.
+
+        Parameters
+        ----------
+        filename : str
+            The image file to update
+        padding : int, optional
+            The number of bytes of padding to include if the file needs to
+            be rewritten.
+
+        Returns
+        -------
+        in_place : bool
+            Whether the file was updated in place
+        """
+
+        if update_xmp(filename, self.to_xmp()):
+            return True
+
+        embed_xmp(filename, filename, self.to_xmp(padding=padding))
+
+        return False
+
+
+def convert_version(avms, version):
+    """
+    Convert AVM objects to another version of the standard.
+
+    This is equivalent to setting ``MetadataVersion`` on each object. The
+    changes between each pair of versions are only worked out once, so
+    each object is updated by adding and removing the tags that differ.
+
+    Parameters
+    ----------
+    avms : iterable of `AVM`
+        The AVM objects to convert
+    version : float
+        The version of the standard to convert to
+    """
+
+    if version not in SPECS:
+        raise ValueError(f"Unknown AVM version: {version}")
+
+    for avm in avms:
+        avm.MetadataVersion = version
@@ -1,10 +1,17 @@
 import datetime
+import math
 import re
 import warnings
 import xml.etree.ElementTree as et
+from functools import cached_property
 
 from .exceptions import AVMItemNotInControlledVocabularyError, AVMListLengthError
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 __all__ = [
     "AVMString",
     "AVMStringCVCapitalize",
@@ -34,6 +41,70 @@ namespaces = {
 reverse_namespaces = {v: k for k, v in namespaces.items()}
 
 
+def escape_text(text):
+    """
+    Escape text for inclusion in XML and encode it, in the same way as
+    ElementTree does for element text.
+    """
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text.encode("utf-8", "xmlcharrefreplace")
+
+
+def text_element(name, text, attributes=b""):
+    """
+    Serialize an element containing text. As for ElementTree, elements
+    without text are written as empty elements.
+    """
+    if not text:
+        return b"<%s%s />" % (name, attributes)
+    return b"<%s%s>%s</%s>" % (name, attributes, escape_text(text), name)
+
+
+def list_element(container, texts):
+    """
+    Serialize an rdf:Bag, rdf:Seq, or rdf:Alt element containing the given
+    items.
+    """
+    if not texts:
+        return b"<rdf:%s />" % container
+    items = [text_element(b"rdf:li", text) for text in texts]
+    return b"<rdf:%s>%s</rdf:%s>" % (container, b"".join(items), container)
+
+
+# Exceptions raised by check_data for invalid values
+
+VALIDATION_ERRORS = (
+    TypeError,
+    ValueError,
+    AVMListLengthError,
+    AVMItemNotInControlledVocabularyError,
+)
+
+# Regular expressions used to check URLs and email addresses
+
+URL_RE = re.compile(
+    r"^https?://"  # http:// or https://
+    r"(?:(?:[A-Z0-9-]+\.)+[A-Z]{2,6}|"  # domain...
+    r"localhost|"  # localhost...
+    r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})"  # ...or ip
+    r"(?::\d+)?"  # optional port
+    r"(?:/?|/\S+)$",
+    re.IGNORECASE,
+)
+
+EMAIL_RE = re.compile(
+    r"(^[-!#$%&'*+/=?^_`{}|~0-9A-Z]+(\.[-!#$%&'*+/=?^_`{}|~0-9A-Z]+)*"  # dot-atom
+    r'|^"([\001-\010\013\014\016-\037!#-\[\]-\177]|\\[\001-011\013\014\016-\177])*"'  # quoted-string
+    r")@(?:[A-Z0-9-]+\.)+[A-Z]{2,6}$",
+    re.IGNORECASE,
+)
+
+
 class AVMData:
     """
     Abstract AVM data class.  All other data classes inherit from AVMData.
@@ -53,6 +124,65 @@ class AVMData:
         """
         return value
 
+    @cached_property
+    def _element_name(self):
+        return f"{self.namespace}:{self.tag}".encode("utf-8")
+
+    def _wrap(self, content):
+        return b"<%s>%s</%s>" % (self._element_name, content, self._element_name)
+
+    def validate_column(self, values):
+        """
+        Check many values at once, for example all the values of a tag in a
+        table. Invalid values do not raise an exception, but are instead
+        flagged in the returned error mask.
+
+        :return: List of checked values (None for invalid values), and list
+                 of booleans indicating which values are invalid
+        """
+        # Rows of NumPy arrays are converted to lists (and elements to Python
+        # scalars), which are what check_data expects
+        if np is not None and isinstance(values, np.ndarray):
+            values = values.tolist()
+        checked_data = []
+        errors = []
+        for value in values:
+            try:
+                checked_data.append(self.check_data(value))
+                errors.append(False)
+            except VALIDATION_ERRORS:
+                checked_data.append(None)
+                errors.append(True)
+        return checked_data, errors
+
+    def _validate_float_array(self, values, ndim):
+        # Convert values to floats with NumPy in one go. Returns None if
+        # this is not possible, and otherwise the checked values and errors,
+        # where values that gave NaN (which may come from None or "-") are
+        # checked individually.
+        if np is None or len(values) == 0:
+            return None
+        try:
+            array = np.asarray(values, dtype=float)
+        except (TypeError, ValueError):
+            return None
+        if array.ndim != ndim:
+            return None
+        if ndim == 2 and not self.check_length(array[0]):
+            return None
+        checked_data = array.tolist()
+        errors = [False] * len(checked_data)
+        invalid = np.isnan(array) if ndim == 1 else np.isnan(array).any(axis=1)
+        if isinstance(values, np.ndarray):
+            values = values.tolist()
+        for index in np.nonzero(invalid)[0].tolist():
+            try:
+                checked_data[index] = self.check_data(values[index])
+            except VALIDATION_ERRORS:
+                checked_data[index] = None
+                errors[index] = True
+        return checked_data, errors
+
 
 class AVMString(AVMData):
     """
@@ -74,8 +204,6 @@ class AVMString(AVMData):
         elif isinstance(value, (int, float)):
             # Accept numeric values and convert to string (e.g., for Equinox)
             # Handle NaN as None
-            import math
-
             if math.isnan(value):
                 return None
             return str(value)
@@ -88,6 +216,15 @@ class AVMString(AVMData):
         element.text = f"{value}"
         return element
 
+    def serialize(self, value):
+        """
+        Serialize the value to XML, giving the same bytes as ElementTree
+        would for the element created by to_xml().
+
+        :return: bytes
+        """
+        return text_element(self._element_name, f"{value}")
+
 
 class AVMURL(AVMString):
     """
@@ -113,17 +250,7 @@ class AVMURL(AVMString):
         if value and "://" not in value:
             value = f"http://{value}"
 
-        url_re = re.compile(
-            r"^https?://"  # http:// or https://
-            r"(?:(?:[A-Z0-9-]+\.)+[A-Z]{2,6}|"  # domain...
-            r"localhost|"  # localhost...
-            r"\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})"  # ...or ip
-            r"(?::\d+)?"  # optional port
-            r"(?:/?|/\S+)$",
-            re.IGNORECASE,
-        )
-
-        if not re.search(url_re, value):
+        if not URL_RE.search(value):
             warnings.warn(f"{self.tag:s} is not a valid URL")
 
         return value
@@ -147,14 +274,7 @@ class AVMEmail(AVMString):
         if not isinstance(value, str):
             raise TypeError(f"{self.tag:s} is not a string or unicode")
 
-        email_re = re.compile(
-            r"(^[-!#$%&'*+/=?^_`{}|~0-9A-Z]+(\.[-!#$%&'*+/=?^_`{}|~0-9A-Z]+)*"  # dot-atom
-            r'|^"([\001-\010\013\014\016-\037!#-\[\]-\177]|\\[\001-011\013\014\016-\177])*"'  # quoted-string
-            r")@(?:[A-Z0-9-]+\.)+[A-Z]{2,6}$",
-            re.IGNORECASE,
-        )
-
-        if not re.search(email_re, value):
+        if not EMAIL_RE.search(value):
             warnings.warn(f"{self.tag:s} is not a valid email address")
 
         return value
@@ -167,6 +287,23 @@ class AVMStringCV(AVMString):
         self.controlled_vocabulary = cv
         super().__init__(path, **kwargs)
 
+    @property
+    def controlled_vocabulary(self):
+        return self._controlled_vocabulary
+
+    @controlled_vocabulary.setter
+    def controlled_vocabulary(self, cv):
+        # Index the vocabulary for fast membership tests, and pre-compute
+        # the formatted value for the usual spellings of each item, so that
+        # format_data does not need to be called for these.
+        self._controlled_vocabulary = cv
+        self._cv_index = frozenset(cv)
+        self._cv_lookup = {}
+        for item in cv:
+            for spelling in (item, item.lower(), item.upper(), item.capitalize()):
+                if self.format_data(spelling) == item:
+                    self._cv_lookup[spelling] = item
+
     def format_data(self, value):
         """
         :return: String
@@ -180,7 +317,7 @@ class AVMStringCV(AVMString):
 
         :return: Boolean
         """
-        return value in self.controlled_vocabulary
+        return value in self._cv_index
 
     def check_data(self, value):
         """
@@ -193,6 +330,9 @@ class AVMStringCV(AVMString):
             return None
 
         if isinstance(value, str):
+            if value in self._cv_lookup:
+                return self._cv_lookup[value]
+
             value = self.format_data(value)
 
             if self.check_cv(value):
@@ -204,6 +344,36 @@ class AVMStringCV(AVMString):
         else:
             raise TypeError(f"{self.tag:s} is not a string or unicode")
 
+    def validate_column(self, values):
+        """
+        Check many values at once, looking up values in the controlled
+        vocabulary without raising exceptions for invalid values.
+
+        :return: List of checked values (None for invalid values), and list
+                 of booleans indicating which values are invalid
+        """
+        lookup = self._cv_lookup
+        checked_data = []
+        errors = []
+        for value in values:
+            if not value:
+                checked_data.append(None)
+                errors.append(False)
+                continue
+            if isinstance(value, str):
+                if value in lookup:
+                    checked_data.append(lookup[value])
+                    errors.append(False)
+                    continue
+                value = self.format_data(value)
+                if value in self._cv_index:
+                    checked_data.append(value)
+                    errors.append(False)
+                    continue
+            checked_data.append(None)
+            errors.append(True)
+        return checked_data, errors
+
 
 class AVMStringCVCapitalize(AVMStringCV):
     def format_data(self, value):
@@ -235,6 +405,10 @@ class AVMLocalizedString(AVMString):
         li.attrib["xml:lang"] = "x-default"
         return element
 
+    def serialize(self, value):
+        item = text_element(b"rdf:li", f"{value}", b' xml:lang="x-default"')
+        return self._wrap(b"<rdf:Alt>" + item + b"</rdf:Alt>")
+
 
 # TODO: implement these
 AVMDate = AVMString
@@ -260,12 +434,27 @@ class AVMFloat(AVMData):
         except (ValueError, TypeError):
             raise TypeError("Enter a value that can be represented as a number.")
 
+    def validate_column(self, values):
+        """
+        Check many values at once, converting them with NumPy if available.
+
+        :return: List of floats (None for missing or invalid values), and
+                 list of booleans indicating which values are invalid
+        """
+        result = self._validate_float_array(values, 1)
+        if result is None:
+            return super().validate_column(values)
+        return result
+
     def to_xml(self, parent, value):
         uri = reverse_namespaces[self.namespace]
         element = et.SubElement(parent, f"{{{uri}}}{self.tag}")
         element.text = f"{value:.16f}"
         return element
 
+    def serialize(self, value):
+        return text_element(self._element_name, f"{value:.16f}")
+
 
 class AVMUnorderedList(AVMData):
     """
@@ -334,6 +523,10 @@ class AVMUnorderedList(AVMData):
 
         return element
 
+    def serialize(self, values):
+        texts = [f"{item:.16f}" if isinstance(item, float) else f"{item}" for item in values]
+        return self._wrap(list_element(b"Bag", texts))
+
 
 class AVMUnorderedStringList(AVMUnorderedList):
     """
@@ -374,6 +567,9 @@ class AVMUnorderedStringList(AVMUnorderedList):
 
         return element
 
+    def serialize(self, values):
+        return self._wrap(list_element(b"Bag", [f"{item}" for item in values]))
+
 
 class AVMOrderedList(AVMUnorderedList):
     """
@@ -395,6 +591,10 @@ class AVMOrderedList(AVMUnorderedList):
 
         return element
 
+    def serialize(self, values):
+        texts = [f"{item:.16f}" if isinstance(item, float) else f"{item}" for item in values]
+        return self._wrap(list_element(b"Seq", texts))
+
 
 class AVMOrderedListCV(AVMOrderedList, AVMStringCVCapitalize):
     """
@@ -427,7 +627,9 @@ class AVMOrderedListCV(AVMOrderedList, AVMStringCVCapitalize):
         for value in values:
             if isinstance(value, str):
                 # Dash is a valid placeholder for unknown values
-                if value.strip() == "-":
+                if value in self._cv_lookup:
+                    checked_data.append(self._cv_lookup[value])
+                elif value.strip() == "-":
                     checked_data.append("-")
                 else:
                     value = self.format_data(value)
@@ -449,6 +651,15 @@ class AVMOrderedListCV(AVMOrderedList, AVMStringCVCapitalize):
 
         return checked_data
 
+    def validate_column(self, values):
+        """
+        Check many lists at once.
+
+        :return: List of lists of CV-Strings (None for invalid values), and
+                 list of booleans indicating which values are invalid
+        """
+        return AVMData.validate_column(self, values)
+
 
 class AVMOrderedFloatList(AVMOrderedList):
     """
@@ -496,6 +707,19 @@ class AVMOrderedFloatList(AVMOrderedList):
 
         return checked_data
 
+    def validate_column(self, values):
+        """
+        Check many lists at once. If NumPy is available and all lists have
+        the same length, they are converted to floats in one go.
+
+        :return: List of lists of floats (None for invalid values), and list
+                 of booleans indicating which values are invalid
+        """
+        result = self._validate_float_array(values, 2)
+        if result is None:
+            return super().validate_column(values)
+        return result
+
     def to_xml(self, parent, values):
         uri = reverse_namespaces[self.namespace]
         element = et.SubElement(parent, f"{{{uri}}}{self.tag}")
@@ -511,6 +735,10 @@ class AVMOrderedFloatList(AVMOrderedList):
 
         return element
 
+    def serialize(self, values):
+        texts = ["-" if item is None else f"{item:.16f}" for item in values]
+        return self._wrap(list_element(b"Seq", texts))
+
 
 class AVMDateTimeList(AVMOrderedList):
     """
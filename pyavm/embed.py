@@ -1,105 +1,706 @@
+import hashlib
+import os
 import struct
 import warnings
 
-from .jpeg import JPEGFile, JPEGSegment, is_jpeg
-from .png import PNGChunk, PNGFile, is_png
+from .formats import sniff_format
+from .io_utils import (
+    copy_range,
+    is_filename,
+    open_image,
+    open_output,
+    write_at,
+    write_buffers,
+)
+from .isobmff import (
+    JXL_CODESTREAM_SIGNATURE,
+    JXL_SIGNATURE,
+    XMP_UUID,
+    ItemInfo,
+    ItemLocation,
+    box,
+    box_header,
+    full_box,
+    iter_boxes,
+    meta_children,
+    pack_iinf,
+    pack_iloc,
+    pack_iref,
+    read_iinf,
+    read_iloc,
+    read_iref,
+    read_pitm,
+)
+from .jpeg import (
+    MAX_XMP_PACKET_SIZE,
+    extended_xmp_segments,
+    read_header_segments,
+    xmp_segment,
+)
+from .png import (
+    PNG_SIGNATURE,
+    XMP_KEYWORD,
+    PNGChunk,
+    iter_chunks,
+    itxt_chunk,
+    parse_itxt,
+)
+from .tiff import BYTE, XMP_TAG, IFDEntry, TIFFHeader, pack_ifd, read_ifd
+from .webp import (
+    ALPHA_FLAG,
+    RIFF_SIGNATURE,
+    WEBP_SIGNATURE,
+    XMP_CHUNK,
+    XMP_FLAG,
+    image_info,
+    vp8x_chunk,
+)
+from .webp import chunk as webp_chunk
+from .webp import iter_chunks as iter_webp_chunks
+from .webp import read_header as read_webp_header
 
+# Standard XMP packet used when the contents are moved to extended XMP
 
-def embed_xmp(image_in, image_out, xmp_packet):
-    if is_jpeg(image_in):
-        # Check length
-        if len(xmp_packet) >= 65503:
-            raise ValueError("XMP packet is too long to embed in JPG file")
+STANDARD_XMP_PACKET = (
+    b'<?xpacket begin="\xef\xbb\xbf" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+    b'<x:xmpmeta xmlns:x="adobe:ns:meta/">'
+    b'<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#">'
+    b'<rdf:Description rdf:about="" xmlns:xmpNote="http://ns.adobe.com/xmp/note/"'
+    b' xmpNote:HasExtendedXMP="%s"/>'
+    b"</rdf:RDF>"
+    b"</x:xmpmeta>"
+    b'<?xpacket end="w"?>'
+)
 
-        # XMP segment
-        xmp_segment = JPEGSegment()
 
-        # APP1 marker
-        xmp_segment.bytes = b"\xff\xe1"
+def xpacket_padding(size):
+    """
+    Return ``size`` bytes of whitespace to pad an XMP packet with.
 
-        # Length of XMP packet + 2 + 29
-        xmp_segment.bytes += struct.pack(">H", len(xmp_packet) + 29 + 2)
+    Following the recommendation in the XMP specification, the padding is
+    split into lines of 100 characters.
+    """
+    lines, remainder = divmod(size, 100)
+    return (b" " * 99 + b"\n") * lines + b" " * remainder
 
-        # XMP Namespace URI (NULL-terminated)
-        xmp_segment.bytes += b"http://ns.adobe.com/xap/1.0/\x00"
 
-        # XMP packet
-        xmp_segment.bytes += xmp_packet
+def _pad_packet(xmp_packet, size):
+    # Pad the XMP packet to ``size`` bytes by inserting whitespace before the
+    # trailing processing instruction
+    end = xmp_packet.rindex(b"<?xpacket end=")
+    return xmp_packet[:end] + xpacket_padding(size - len(xmp_packet)) + xmp_packet[end:]
 
-        # Read in input file
-        jpeg_file = JPEGFile.read(image_in)
 
-        # Check if there is already XMP data in the file
-        existing = []
-        for segment in jpeg_file.segments:
-            if segment.type == "APP1":
-                if segment.bytes[4:32] == b"http://ns.adobe.com/xap/1.0/":
-                    existing.append(segment)
-        if existing:
-            warnings.warn("Discarding existing XMP packet from JPEG file")
-            for e in existing:
-                jpeg_file.segments.remove(e)
+def _same_file(filename1, filename2):
+    return os.path.exists(filename2) and os.path.samefile(filename1, filename2)
 
-        # Position at which to insert the packet
-        markers = [x.type for x in jpeg_file.segments]
 
-        if "APP1" in markers:  # Put it after existing APP1
-            index = markers.index("APP1") + 1
-        elif "APP0" in markers:  # Put it after existing APP0
-            index = markers.index("APP0") + 1
-        elif "SOF" in markers:
-            index = markers.index("SOF")
+def _open_input(image_in, image_out):
+    # The input file is read in chunks while the output is written, so if we
+    # are overwriting the input, we need to read it into memory first.
+    if is_filename(image_in) and is_filename(image_out) and _same_file(image_in, image_out):
+        with open(image_in, "rb") as fileobj:
+            return open_image(fileobj.read())
+    else:
+        return open_image(image_in)
+
+
+def _copy_ranges(fileobj_in, fileobj_out, ranges):
+    # Copy (start, end) ranges from the input to the output, merging
+    # contiguous ranges so as to minimize the number of copy operations
+    merged = []
+    for start, end in ranges:
+        if merged and merged[-1][1] == start:
+            merged[-1][1] = end
         else:
-            raise ValueError("Could not find SOF marker")
+            merged.append([start, end])
+    for start, end in merged:
+        copy_range(fileobj_in, fileobj_out, start, end - start)
+
+
+def _split_extended_xmp(xmp_packet):
+    # Move the contents of an XMP packet that is too large for a JPEG
+    # segment to extended XMP, leaving a standard packet that only
+    # references it.
+    start = xmp_packet.index(b"?>", xmp_packet.index(b"<?xpacket begin=")) + 2
+    end = xmp_packet.rindex(b"<?xpacket end=")
+    extended_xmp = xmp_packet[start:end].strip()
+    guid = hashlib.md5(extended_xmp).hexdigest().upper().encode("ascii")
+    return STANDARD_XMP_PACKET % guid, extended_xmp, guid
+
+
+def _embed_jpeg(fileobj_in, fileobj_out, xmp_packet):
+    if len(xmp_packet) > MAX_XMP_PACKET_SIZE:
+        xmp_packet, extended_xmp, guid = _split_extended_xmp(xmp_packet)
+        xmp_segments = [xmp_segment(xmp_packet)] + extended_xmp_segments(extended_xmp, guid)
+    else:
+        xmp_segments = [xmp_segment(xmp_packet)]
+
+    # Read in the segments preceding the compressed image data. The rest of
+    # the file does not need to be modified, so is copied as-is below.
+    segments = read_header_segments(fileobj_in)
+    scan_offset = fileobj_in.tell()
+
+    if not segments or segments[0].type != "SOI":
+        raise ValueError("Image did not start with SOI")
+
+    # Check if there is already XMP data in the file
+    existing = []
+    for segment in segments:
+        if segment.is_xmp or segment.is_extended_xmp:
+            existing.append(segment)
+    if existing:
+        warnings.warn("Discarding existing XMP packet from JPEG file")
+        for e in existing:
+            segments.remove(e)
+
+    # Position at which to insert the packet
+    markers = [x.type for x in segments]
+
+    if "APP1" in markers:  # Put it after existing APP1
+        index = markers.index("APP1") + 1
+    elif "APP0" in markers:  # Put it after existing APP0
+        index = markers.index("APP0") + 1
+    elif any(marker.startswith("SOF") for marker in markers):
+        index = [marker.startswith("SOF") for marker in markers].index(True)
+    else:
+        raise ValueError("Could not find SOF marker")
+
+    # Insert segments into JPEG file
+    segments[index:index] = xmp_segments
+
+    write_buffers(fileobj_out, [segment.bytes for segment in segments])
+    copy_range(fileobj_in, fileobj_out, scan_offset)
+
+
+def _embed_png(fileobj_in, fileobj_out, xmp_packet, compression_threshold=None):
+    compress = compression_threshold is not None and len(xmp_packet) >= compression_threshold
+    xmp_chunk = itxt_chunk(XMP_KEYWORD, xmp_packet, compress=compress)
+
+    # Check signature
+    sig = fileobj_in.read(8)
+    if sig != PNG_SIGNATURE:
+        raise ValueError(f"Signature ({sig}) does match expected ({PNG_SIGNATURE})")
+
+    # Find the position of all chunks in the input file - apart from existing
+    # XMP packets, these are copied as-is to the output file.
+    ranges = []
+    existing = False
+    for offset, length, chunk_type in iter_chunks(fileobj_in):
+        if chunk_type == b"iTXt":
+            fileobj_in.seek(offset + 8)
+            if fileobj_in.read(18) == XMP_KEYWORD + b"\x00":
+                existing = True
+                continue
+        ranges.append((offset, offset + length + 12))
+
+    if existing:
+        warnings.warn("Discarding existing XMP packet from PNG file")
+
+    # Signature and header chunk
+    _copy_ranges(fileobj_in, fileobj_out, [(0, 8)] + ranges[:1])
+
+    # Insert XMP chunk after the header
+    write_buffers(fileobj_out, xmp_chunk.buffers())
+
+    # Remaining chunks
+    _copy_ranges(fileobj_in, fileobj_out, ranges[1:])
+
+
+def _embed_tiff(fileobj_in, fileobj_out, xmp_packet):
+    header = TIFFHeader.read(fileobj_in)
+
+    # Only the first IFD, which describes the main image, needs to be read
+    entries, next_offset = read_ifd(fileobj_in, header, header.ifd_offset)
+
+    existing = [entry for entry in entries if entry.tag == XMP_TAG]
+    if existing:
+        warnings.warn("Discarding existing XMP packet from TIFF file")
+
+    # The packet is appended to the file, aligned on a word boundary as
+    # required by the specification. The rest of the file, including the
+    # image data, is copied as-is.
+    size = fileobj_in.seek(0, os.SEEK_END)
+    packet_offset = size + size % 2
+    xmp_entry = IFDEntry.for_data(header, XMP_TAG, BYTE, xmp_packet, packet_offset)
+
+    if existing:
+        # Patch the existing entry to point to the new packet
+        entry_offset = existing[0].offset
+        _copy_ranges(fileobj_in, fileobj_out, [(0, entry_offset)])
+        fileobj_out.write(xmp_entry.pack(header))
+        _copy_ranges(fileobj_in, fileobj_out, [(entry_offset + header.entry_size, size)])
+        write_buffers(fileobj_out, [b"\x00" * (size % 2), xmp_packet])
+    else:
+        # The IFD can't be extended in place, so we write a new one with the
+        # XMP entry after the packet, and point the header to it. Values
+        # stored outside the original IFD are still referenced by offset.
+        ifd_offset = packet_offset + len(xmp_packet)
+        ifd_offset += ifd_offset % 2
+        if ifd_offset > header.max_offset:
+            raise ValueError("File is too large to be stored as a classic TIFF file")
+        header.ifd_offset = ifd_offset
+        fileobj_out.write(header.pack())
+        _copy_ranges(fileobj_in, fileobj_out, [(header.size, size)])
+        write_buffers(
+            fileobj_out,
+            [
+                b"\x00" * (size % 2),
+                xmp_packet,
+                b"\x00" * (len(xmp_packet) % 2),
+                pack_ifd(header, entries + [xmp_entry], next_offset),
+            ],
+        )
+
+
+def _embed_webp(fileobj_in, fileobj_out, xmp_packet):
+    end = read_webp_header(fileobj_in)
+
+    # Find the position of all chunks in the input file - apart from existing
+    # XMP packets and the VP8X chunk, these are copied as-is to the output.
+    chunks = list(iter_webp_chunks(fileobj_in, end))
+
+    if not chunks:
+        raise ValueError("WebP file does not contain any chunks")
+
+    offset, size, fourcc = chunks[0]
+    fileobj_in.seek(offset + 8)
+    data = fileobj_in.read(min(size, 30))
+
+    if fourcc == b"VP8X":
+        # Set the XMP flag in the existing header chunk
+        vp8x = webp_chunk(b"VP8X", bytes([data[0] | XMP_FLAG]) + data[1:])
+        chunks = chunks[1:]
+    else:
+        # Files using the simple format need a VP8X chunk for metadata
+        width, height, alpha = image_info(fourcc, data)
+        vp8x = vp8x_chunk(XMP_FLAG | (ALPHA_FLAG if alpha else 0), width, height)
+
+    ranges = [
+        (offset, offset + 8 + size + size % 2)
+        for offset, size, fourcc in chunks
+        if fourcc != XMP_CHUNK
+    ]
+
+    if len(ranges) < len(chunks):
+        warnings.warn("Discarding existing XMP packet from WebP file")
+
+    xmp_chunk = webp_chunk(XMP_CHUNK, xmp_packet)
+
+    size = 4 + len(vp8x) + sum(end - start for start, end in ranges) + len(xmp_chunk)
+
+    write_buffers(fileobj_out, [RIFF_SIGNATURE, struct.pack("<I", size), WEBP_SIGNATURE, vp8x])
+    _copy_ranges(fileobj_in, fileobj_out, ranges)
+    write_buffers(fileobj_out, [xmp_chunk])
+
+
+def _copy_boxes(fileobj_in, fileobj_out, boxes):
+    # Copy boxes from the input to the output. The last box in a file can
+    # have a size of zero, meaning that it extends to the end of the file,
+    # so we give it an explicit size as boxes are appended after it.
+    if boxes:
+        offset, size, header_size, box_type = boxes[-1]
+        fileobj_in.seek(offset)
+        if fileobj_in.read(4) == b"\x00\x00\x00\x00":
+            header = box_header(box_type, size - header_size)
+            if len(header) != header_size:
+                raise ValueError("Box extending to the end of the file is too large")
+            _copy_ranges(fileobj_in, fileobj_out, [(b[0], b[0] + b[1]) for b in boxes[:-1]])
+            write_buffers(fileobj_out, [header])
+            copy_range(fileobj_in, fileobj_out, offset + header_size, size - header_size)
+            return
+    _copy_ranges(fileobj_in, fileobj_out, [(b[0], b[0] + b[1]) for b in boxes])
+
+
+def _embed_jxl(fileobj_in, fileobj_out, xmp_packet, boxes):
+    if not boxes:
+        # Bare codestreams can't contain metadata, so we wrap them in a
+        # container.
+        size = fileobj_in.seek(0, os.SEEK_END)
+        write_buffers(
+            fileobj_out,
+            [JXL_SIGNATURE, box(b"ftyp", b"jxl \x00\x00\x00\x00jxl "), box_header(b"jxlc", size)],
+        )
+        copy_range(fileobj_in, fileobj_out, 0, size)
+    else:
+        kept = [b for b in boxes if b[3] != b"xml "]
+        if len(kept) < len(boxes):
+            warnings.warn("Discarding existing XMP packet from JPEG XL file")
+        _copy_boxes(fileobj_in, fileobj_out, kept)
+
+    write_buffers(fileobj_out, [box(b"xml ", xmp_packet)])
+
+
+def _embed_heif(fileobj_in, fileobj_out, xmp_packet, boxes):
+    types = [b[3] for b in boxes]
+
+    if b"meta" not in types:
+        raise ValueError("Could not find meta box")
+
+    if b"moov" in types:
+        raise ValueError("Image sequences are not supported")
+
+    meta_offset, meta_size, _, _ = boxes[types.index(b"meta")]
+    meta_end = meta_offset + meta_size
+
+    fileobj_in.seek(meta_offset)
+    version, flags, children = meta_children(fileobj_in.read(meta_size))
+
+    child_types = [child[0] for child in children]
+
+    if b"iinf" not in child_types or b"iloc" not in child_types:
+        raise ValueError("Could not find iinf and iloc boxes in meta box")
+
+    iinf_version, items = read_iinf(children[child_types.index(b"iinf")][1])
+    iloc_version, locations = read_iloc(children[child_types.index(b"iloc")][1])
+
+    if b"iref" in child_types:
+        iref_version, references = read_iref(children[child_types.index(b"iref")][1])
+    else:
+        iref_version, references = 0, []
+
+    # Remove existing XMP items and any references from them
+    existing = {item.item_id for item in items if item.is_xmp}
+    if existing:
+        warnings.warn("Discarding existing XMP packet from HEIF file")
+        for location in locations:
+            if location.item_id in existing:
+                # If the packet is the only thing in the last 'mdat' box (as
+                # is the case for packets embedded by this function), we can
+                # remove the box without moving any other data.
+                offset, size, header_size, box_type = boxes[-1]
+                extent = (0, offset + header_size - location.base_offset, size - header_size)
+                if box_type == b"mdat" and location.extents == [extent]:
+                    boxes = boxes[:-1]
+        items = [item for item in items if item.item_id not in existing]
+        locations = [location for location in locations if location.item_id not in existing]
+        references = [ref for ref in references if ref[1] not in existing]
+
+    # Add the new item, which describes the primary item if there is one
+    item_id = max([item.item_id for item in items], default=0) + 1
+    items.append(ItemInfo.for_xmp(item_id))
+    if b"pitm" in child_types:
+        primary = read_pitm(children[child_types.index(b"pitm")][1])
+        references.append((b"cdsc", item_id, [primary]))
+
+    size = boxes[-1][0] + boxes[-1][1]
+
+    # The packet is stored in a new 'mdat' box at the end of the file. As the
+    # size of the 'meta' box changes, any data after it moves, so offsets to
+    # it need to be updated. Since the size of the offsets depends on their
+    # values, we iterate until the size of the 'meta' box is stable.
+    mdat_header = box_header(b"mdat", len(xmp_packet))
+    delta = 0
+    while True:
+        new_locations = [_shift_location(location, meta_end, delta) for location in locations]
+        new_locations.append(
+            ItemLocation(item_id, 0, 0, 0, [(0, size + delta + len(mdat_header), len(xmp_packet))])
+        )
+        new_children = []
+        for child_type, child in children:
+            if child_type == b"iinf":
+                new_children.append(pack_iinf(iinf_version, items))
+                if references and b"iref" not in child_types:
+                    new_children.append(pack_iref(iref_version, references))
+            elif child_type == b"iloc":
+                new_children.append(pack_iloc(iloc_version, new_locations))
+            elif child_type == b"iref":
+                new_children.append(pack_iref(iref_version, references))
+            else:
+                new_children.append(child)
+        meta = full_box(b"meta", version, flags, b"".join(new_children))
+        if len(meta) - meta_size == delta:
+            break
+        delta = len(meta) - meta_size
+
+    _copy_boxes(fileobj_in, fileobj_out, [b for b in boxes if b[0] < meta_offset])
+    write_buffers(fileobj_out, [meta])
+    _copy_boxes(fileobj_in, fileobj_out, [b for b in boxes if b[0] > meta_offset])
+    write_buffers(fileobj_out, [mdat_header, xmp_packet])
+
+
+def _shift_location(location, start, delta):
+    # Return a copy of an item location, with offsets in the file beyond
+    # ``start`` shifted by ``delta``.
+    if location.construction_method != 0 or delta == 0:
+        return location
+    base_offset = location.base_offset
+    extents = location.extents
+    if base_offset > 0 and base_offset >= start:
+        base_offset += delta
+    else:
+        extents = [
+            (index, offset + delta if base_offset + offset >= start else offset, length)
+            for index, offset, length in extents
+        ]
+    return ItemLocation(
+        location.item_id,
+        location.construction_method,
+        location.data_reference_index,
+        base_offset,
+        extents,
+    )
+
+
+def _embed_isobmff(fileobj_in, fileobj_out, xmp_packet):
+    size = fileobj_in.seek(0, os.SEEK_END)
+
+    fileobj_in.seek(0)
+    if fileobj_in.read(2) == JXL_CODESTREAM_SIGNATURE:
+        _embed_jxl(fileobj_in, fileobj_out, xmp_packet, [])
+        return
+
+    boxes = list(iter_boxes(fileobj_in, 0, size))
+
+    if boxes[0][3] == b"JXL ":
+        _embed_jxl(fileobj_in, fileobj_out, xmp_packet, boxes)
+    else:
+        _embed_heif(fileobj_in, fileobj_out, xmp_packet, boxes)
+
+
+def embed_xmp(image_in, image_out, xmp_packet, compression_threshold=None):
+    """
+    Embed an XMP packet into an image file.
+
+    Parameters
+    ----------
+    image_in : str, file-like, bytes, or memoryview
+        The input image, given either as a filename, a binary file object, or
+        the contents of the image
+    image_out : str, file-like, or None
+        The output image, given either as a filename (which can be the same
+        as the input) or a binary file object. If `None`, the contents of the
+        output image are returned instead.
+    xmp_packet : bytes
+        The XMP packet
+    compression_threshold : int, optional
+        For PNG files, XMP packets of at least this size (in bytes) are
+        compressed with zlib. By default, packets are not compressed, which
+        allows them to later be updated in place.
+
+    Returns
+    -------
+    contents : bytes or None
+        The contents of the output image if ``image_out`` is `None`
+    """
+    with _open_input(image_in, image_out) as fileobj_in:
+        image_format = sniff_format(fileobj_in)
+
+        if image_format is None:
+            raise ValueError(
+                "Only JPG, PNG, TIFF, WebP, HEIF/AVIF, and JPEG XL files are supported at this time"
+            )
+
+        with open_output(image_out) as fileobj_out:
+            if image_format == "jpeg":
+                _embed_jpeg(fileobj_in, fileobj_out, xmp_packet)
+            elif image_format == "tiff":
+                _embed_tiff(fileobj_in, fileobj_out, xmp_packet)
+            elif image_format == "webp":
+                _embed_webp(fileobj_in, fileobj_out, xmp_packet)
+            elif image_format == "isobmff":
+                _embed_isobmff(fileobj_in, fileobj_out, xmp_packet)
+            else:
+                _embed_png(
+                    fileobj_in,
+                    fileobj_out,
+                    xmp_packet,
+                    compression_threshold=compression_threshold,
+                )
+
+            if image_out is None:
+                return fileobj_out.getvalue()
+
+
+def _update_jpeg(fileobj, xmp_packet):
+    segments = read_header_segments(fileobj)
+
+    # Packets with extended XMP can't be updated in place
+    if any(segment.is_extended_xmp for segment in segments):
+        return False
+
+    segments = [segment for segment in segments if segment.is_xmp]
+
+    if len(segments) != 1:
+        return False
+
+    # The packet starts after the marker, length, and namespace
+    offset = segments[0].offset + 33
+    size = len(segments[0].bytes) - 33
+
+    if len(xmp_packet) > size:
+        return False
+
+    write_at(fileobj, offset, _pad_packet(xmp_packet, size))
+
+    return True
+
+
+def _update_png(fileobj, xmp_packet):
+    sig = fileobj.read(8)
+    if sig != PNG_SIGNATURE:
+        raise ValueError(f"Signature ({sig}) does match expected ({PNG_SIGNATURE})")
+
+    existing = []
+    for offset, length, chunk_type in iter_chunks(fileobj):
+        if chunk_type == b"iTXt":
+            fileobj.seek(offset + 8)
+            if fileobj.read(18) == XMP_KEYWORD + b"\x00":
+                existing.append((offset, length))
+
+    if len(existing) != 1:
+        return False
+
+    offset, length = existing[0]
+
+    # Find the start of the text, which follows the keyword, compression flag
+    # and method, language tag, and translated keyword.
+    fileobj.seek(offset + 8)
+    header = fileobj.read(min(length, 1024))
+    try:
+        _, compressed, text_start = parse_itxt(header)
+    except ValueError:
+        return False
+
+    # We can't update compressed packets in place
+    if compressed:
+        return False
+
+    size = length - text_start
+
+    if len(xmp_packet) > size:
+        return False
+
+    xmp_chunk = PNGChunk()
+    xmp_chunk.type = b"iTXt"
+    xmp_chunk.data = header[:text_start] + _pad_packet(xmp_packet, size)
+
+    write_at(fileobj, offset + 8 + text_start, xmp_chunk.data[text_start:])
+    write_at(fileobj, offset + 8 + length, struct.pack(">I", xmp_chunk.crc))
+
+    return True
+
+
+def _update_tiff(fileobj, xmp_packet):
+    header = TIFFHeader.read(fileobj)
+
+    entries, _ = read_ifd(fileobj, header, header.ifd_offset)
+
+    existing = [
+        (entry.data_offset(header), entry.data_size()) for entry in entries if entry.tag == XMP_TAG
+    ]
+
+    # Packets stored in the entry itself can't be updated in place
+    if any(offset is None for offset, _ in existing):
+        return False
+
+    return _update_packet(fileobj, existing, xmp_packet)
+
+
+def _update_packet(fileobj, existing, xmp_packet):
+    # Given the (offset, size) of the existing packets, overwrite the packet
+    # if there is only one and the new packet fits.
+    if len(existing) != 1:
+        return False
+
+    offset, size = existing[0]
+
+    if len(xmp_packet) > size:
+        return False
+
+    write_at(fileobj, offset, _pad_packet(xmp_packet, size))
+
+    return True
+
+
+def _update_webp(fileobj, xmp_packet):
+    end = read_webp_header(fileobj)
+
+    existing = [
+        (offset + 8, size)
+        for offset, size, fourcc in iter_webp_chunks(fileobj, end)
+        if fourcc == XMP_CHUNK
+    ]
+
+    return _update_packet(fileobj, existing, xmp_packet)
+
+
+def _update_isobmff(fileobj, xmp_packet):
+    end = fileobj.seek(0, os.SEEK_END)
+
+    fileobj.seek(0)
+    if fileobj.read(2) == JXL_CODESTREAM_SIGNATURE:
+        return False
+
+    existing = []
+    for offset, size, header_size, box_type in iter_boxes(fileobj, 0, end):
+        if box_type == b"xml ":
+            existing.append((offset + header_size, size - header_size))
+        elif box_type == b"uuid":
+            fileobj.seek(offset + header_size)
+            if fileobj.read(16) == XMP_UUID:
+                existing.append((offset + header_size + 16, size - header_size - 16))
+        elif box_type == b"meta":
+            fileobj.seek(offset)
+            _, _, children = meta_children(fileobj.read(size))
+            children = dict(children)
+            if b"iinf" not in children or b"iloc" not in children:
+                continue
+            _, items = read_iinf(children[b"iinf"])
+            _, locations = read_iloc(children[b"iloc"])
+            xmp_ids = {item.item_id for item in items if item.is_xmp}
+            for location in locations:
+                if location.item_id in xmp_ids:
+                    # Only packets stored contiguously in the file can be
+                    # updated in place
+                    if location.construction_method != 0 or len(location.extents) != 1:
+                        return False
+                    _, extent_offset, extent_length = location.extents[0]
+                    existing.append((location.base_offset + extent_offset, extent_length))
 
-        # Insert segment into JPEG file
-        jpeg_file.segments.insert(index, xmp_segment)
-        jpeg_file.write(image_out)
+    return _update_packet(fileobj, existing, xmp_packet)
 
-    elif is_png(image_in):
-        xmp_chunk = PNGChunk()
 
-        # Keyword
-        xmp_chunk.data = b"XML:com.adobe.xmp"
+def update_xmp(image, xmp_packet):
+    """
+    Replace the XMP packet in an image file in place.
 
-        # Null separator
-        xmp_chunk.data += b"\x00"
+    This is only possible if the file contains a single (uncompressed) XMP
+    packet, and the new packet fits in the space used by the existing one -
+    in this case, the new packet is padded with whitespace to the size of the
+    existing one and only the packet (and for PNG files the chunk CRC) is
+    overwritten, leaving the rest of the file untouched.
 
-        # Compression flag
-        xmp_chunk.data += b"\x00"
+    ``image`` can be a filename or a binary file object opened for reading
+    and writing.
 
-        # Compression method
-        xmp_chunk.data += b"\x00"
+    Returns `True` if the packet was replaced, and `False` otherwise, in which
+    case the file is not modified.
+    """
+    if is_filename(image):
+        with open(image, "r+b") as fileobj:
+            return update_xmp(fileobj, xmp_packet)
 
-        # Null separator
-        xmp_chunk.data += b"\x00"
+    image.seek(0)
 
-        # Null separator
-        xmp_chunk.data += b"\x00"
+    image_format = sniff_format(image)
 
-        # Text
-        xmp_chunk.data += xmp_packet
+    if image_format == "jpeg":
+        return _update_jpeg(image, xmp_packet)
 
-        # Set type
-        xmp_chunk.type = b"iTXt"
+    elif image_format == "png":
+        return _update_png(image, xmp_packet)
 
-        # Read in input file
-        png_file = PNGFile.read(image_in)
+    elif image_format == "tiff":
+        return _update_tiff(image, xmp_packet)
 
-        # Check if there is already XMP data in the file
-        existing = []
-        for chunk in png_file.chunks:
-            if chunk.type == b"iTXt":
-                if chunk.data.startswith(b"XML:com.adobe.xmp"):
-                    existing.append(chunk)
-        if existing:
-            warnings.warn("Discarding existing XMP packet from PNG file")
-            for e in existing:
-                png_file.chunks.remove(e)
+    elif image_format == "webp":
+        return _update_webp(image, xmp_packet)
 
-        # Insert chunk into PNG file
-        png_file.chunks.insert(1, xmp_chunk)
-        png_file.write(image_out)
+    elif image_format == "isobmff":
+        return _update_isobmff(image, xmp_packet)
 
     else:
-        raise ValueError("Only JPG and PNG files are supported at this time")
+        raise ValueError(
+            "Only JPG, PNG, TIFF, WebP, HEIF/AVIF, and JPEG XL files are supported at this time"
+        )
@@ -1,12 +1,38 @@
+import hashlib
+import os
 import re
 import warnings
+import xml.etree.ElementTree as et
 
 from .exceptions import NoXMPPacketFound
-from .jpeg import JPEGFile, is_jpeg
-from .png import PNGFile, is_png
+from .formats import sniff_format
+from .io_utils import open_image
+from .isobmff import (
+    JXL_CODESTREAM_SIGNATURE,
+    XMP_UUID,
+    item_data,
+    iter_boxes,
+    meta_children,
+    read_iinf,
+    read_iloc,
+)
+from .jpeg import read_extended_xmp, read_header_segments
+from .png import PNG_SIGNATURE, XMP_KEYWORD, itxt_text, read_chunks
+from .tiff import XMP_TAG, TIFFHeader, iter_ifds, read_entry_data
+from .webp import XMP_CHUNK
+from .webp import iter_chunks as iter_webp_chunks
+from .webp import read_header as read_webp_header
 
 __all__ = ["extract_xmp"]
 
+RDF_NAMESPACE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+
+XPACKET_BEGIN = b"<?xpacket begin="
+
+XMPMETA_END = b"</x:xmpmeta>"
+
+HAS_EXTENDED_XMP = re.compile(rb"HasExtendedXMP(?:=[\"']|>)([0-9A-Fa-f]{32})")
+
 
 def _select_packet(packets, xmp_packet_index):
     """
@@ -35,61 +61,245 @@ def _select_packet(packets, xmp_packet_index):
     return packets[xmp_packet_index]
 
 
-def extract_xmp(image, xmp_packet_index=None):
-    if is_jpeg(image):
-        # Read in input file
-        jpeg_file = JPEGFile.read(image)
+def _merge_extended_xmp(xmp_packet, extended_xmp):
+    """
+    Merge the properties from extended XMP into the standard XMP packet.
+    """
+
+    start = xmp_packet.index(b"?>", xmp_packet.index(b"<?xpacket begin=")) + 2
+    end = xmp_packet.rindex(b"<?xpacket end=")
+
+    root = et.fromstring(xmp_packet[start:end])
+    extended_root = et.fromstring(extended_xmp)
+
+    rdf_tag = f"{{{RDF_NAMESPACE}}}RDF"
+    rdf = root if root.tag == rdf_tag else root.find(rdf_tag)
+    extended_rdf = extended_root if extended_root.tag == rdf_tag else extended_root.find(rdf_tag)
+
+    if rdf is None or extended_rdf is None:
+        warnings.warn("Could not find RDF element in extended XMP - ignoring")
+        return xmp_packet
+
+    rdf.extend(extended_rdf)
+
+    return xmp_packet[:start] + b"\n" + et.tostring(root, encoding="utf-8") + xmp_packet[end:]
+
+
+def _extract_jpeg(fileobj, xmp_packet_index):
+    # Read in the header of the input file - the XMP packet is always
+    # before the compressed image data, so we don't need to read further.
+    segments = read_header_segments(fileobj)
+
+    if not segments or segments[0].type != "SOI":
+        raise ValueError("Image did not start with SOI")
+
+    # Loop through segments and search for XMP packet
+    xmp_segments = [segment.bytes[32:] for segment in segments if segment.is_xmp]
+
+    xmp_packet = _select_packet(xmp_segments, xmp_packet_index)
+
+    # If the packet refers to extended XMP, merge the latter in
+    match = HAS_EXTENDED_XMP.search(xmp_packet)
+    if match:
+        guid = match.group(1).upper()
+        extended_xmp = read_extended_xmp(segments, guid)
+        if extended_xmp is None:
+            warnings.warn("Extended XMP referenced by XMP packet is missing - ignoring")
+        elif hashlib.md5(extended_xmp).hexdigest().upper().encode("ascii") != guid:
+            warnings.warn("Extended XMP does not match its MD5 digest - ignoring")
+        else:
+            xmp_packet = _merge_extended_xmp(xmp_packet, extended_xmp)
+
+    return xmp_packet
+
+
+def _extract_png(fileobj, xmp_packet_index):
+    # Read in the text chunks from the input file, skipping over the image
+    # data.
+    sig = fileobj.read(8)
+    if sig != PNG_SIGNATURE:
+        raise ValueError(f"Signature ({sig}) does match expected ({PNG_SIGNATURE})")
+    chunks = read_chunks(fileobj, {b"iTXt"}, verify="metadata")
+
+    # Loop through chunks and search for XMP packet
+    xmp_chunks = [
+        itxt_text(chunk.data) for chunk in chunks if chunk.data[:18] == XMP_KEYWORD + b"\x00"
+    ]
+
+    return _select_packet(xmp_chunks, xmp_packet_index)
+
+
+def _extract_tiff(fileobj, xmp_packet_index):
+    # Walk the chain of IFDs, only reading the values of XMP entries
+    header = TIFFHeader.read(fileobj)
+
+    entries = []
+    for _, ifd_entries in iter_ifds(fileobj, header):
+        entries.extend(entry for entry in ifd_entries if entry.tag == XMP_TAG)
+
+    xmp_entries = [read_entry_data(fileobj, header, entry) for entry in entries]
+
+    return _select_packet(xmp_entries, xmp_packet_index)
+
+
+def _extract_webp(fileobj, xmp_packet_index):
+    # Hop from chunk to chunk, only reading the data of XMP chunks
+    end = read_webp_header(fileobj)
+
+    xmp_chunks = []
+    for offset, size, fourcc in iter_webp_chunks(fileobj, end):
+        if fourcc == XMP_CHUNK:
+            fileobj.seek(offset + 8)
+            xmp_chunks.append(fileobj.read(size))
+
+    return _select_packet(xmp_chunks, xmp_packet_index)
+
 
-        # Loop through segments and search for XMP packet
-        xmp_segments = [
-            segment.bytes[32:]
-            for segment in jpeg_file.segments
-            if segment.type == "APP1" and segment.bytes[4:32] == b"http://ns.adobe.com/xap/1.0/"
-        ]
+def _read_meta_xmp(fileobj, meta):
+    # Read the XMP packets stored as items in a 'meta' box
+    _, _, children = meta_children(meta)
+    children = dict(children)
+    if b"iinf" not in children or b"iloc" not in children:
+        return []
+    _, items = read_iinf(children[b"iinf"])
+    _, locations = read_iloc(children[b"iloc"])
+    locations = {location.item_id: location for location in locations}
+    idat = children[b"idat"][8:] if b"idat" in children else None
+    return [
+        item_data(fileobj, locations[item.item_id], idat=idat)
+        for item in items
+        if item.is_xmp and item.item_id in locations
+    ]
 
-        return _select_packet(xmp_segments, xmp_packet_index)
 
-    elif is_png(image):
-        # Read in input file
-        png_file = PNGFile.read(image)
+def _extract_isobmff(fileobj, xmp_packet_index):
+    # Hop from box to box, only reading the contents of boxes that can
+    # contain XMP packets
+    end = fileobj.seek(0, os.SEEK_END)
 
-        # Loop through chunks and search for XMP packet
-        xmp_chunks = [
-            chunk.data[22:]
-            for chunk in png_file.chunks
-            if chunk.type == b"iTXt" and chunk.data.startswith(b"XML:com.adobe.xmp")
-        ]
+    # Bare JPEG XL codestreams can't contain metadata
+    fileobj.seek(0)
+    if fileobj.read(2) == JXL_CODESTREAM_SIGNATURE:
+        raise NoXMPPacketFound("No XMP packet present in file")
+
+    packets = []
+    for offset, size, header_size, box_type in iter_boxes(fileobj, 0, end):
+        if box_type == b"meta":
+            fileobj.seek(offset)
+            packets.extend(_read_meta_xmp(fileobj, fileobj.read(size)))
+        elif box_type == b"uuid":
+            fileobj.seek(offset + header_size)
+            if fileobj.read(16) == XMP_UUID:
+                packets.append(fileobj.read(size - header_size - 16))
+        elif box_type == b"xml ":
+            fileobj.seek(offset + header_size)
+            packets.append(fileobj.read(size - header_size))
+
+    return _select_packet(packets, xmp_packet_index)
+
+
+def _iter_find(fileobj, pattern, block_size):
+    """
+    Iterate over the offsets of ``pattern`` in a file, starting from the
+    current position.
+
+    The file is read ``block_size`` bytes at a time, and the end of each
+    block is kept so that occurrences spanning two blocks are found. The
+    file position may be changed between iterations.
+    """
+    position = fileobj.tell()
+    tail = b""
+    while True:
+        fileobj.seek(position)
+        block = fileobj.read(block_size)
+        if not block:
+            return
+        buffer = tail + block
+        base = position - len(tail)
+        position += len(block)
+        index = buffer.find(pattern)
+        while index >= 0:
+            yield base + index
+            index = buffer.find(pattern, index + 1)
+        tail = buffer[max(0, len(buffer) - len(pattern) + 1) :]
+
+
+def _scan_xmp(fileobj, xmp_packet_index, block_size=1 << 20):
+    """
+    Scan the contents of a file for XMP packets.
+
+    The file is read in blocks, so the memory used does not depend on the
+    size of the file, and the scan stops as soon as the requested packet has
+    been found (or, if ``xmp_packet_index`` is `None`, as soon as we know
+    whether there is more than one packet).
+    """
+
+    target = 0 if xmp_packet_index is None else xmp_packet_index
+
+    count = 0
+    packet = None
+
+    for offset in _iter_find(fileobj, XPACKET_BEGIN, block_size):
+        if count == target:
+            fileobj.seek(offset)
+            end = next(_iter_find(fileobj, XMPMETA_END, block_size), None)
+            if end is None:
+                raise ValueError("Could not find the end of the XMP packet")
+            fileobj.seek(offset)
+            packet = fileobj.read(end + len(XMPMETA_END) - offset)
+        count += 1
+        if packet is not None and (xmp_packet_index is not None or count > 1):
+            break
+
+    if count == 0:
+        raise NoXMPPacketFound("No XMP packet present in file")
 
-        return _select_packet(xmp_chunks, xmp_packet_index)
+    if packet is None:
+        raise IndexError(
+            f"xmp_packet was set to {xmp_packet_index} but only {count} packets are present"
+        )
 
-    else:
+    if xmp_packet_index is None and count > 1:
         warnings.warn(
-            "Only PNG and JPEG files can be properly parsed - scanning file contents for XMP packet"
+            "Multiple XMP packets are present but "
+            "xmp_packet_index was not specified, assuming "
+            "xmp_packet_index=0"
         )
 
-        with open(image, "rb") as fileobj:
-            contents = fileobj.read()
-
-        start_positions = [m.start() for m in re.finditer(b"<?xpacket begin=", contents)]
-
-        if not start_positions:
-            raise NoXMPPacketFound("No XMP packet present in file")
-
-        if xmp_packet_index is None:
-            if len(start_positions) > 1:
-                warnings.warn(
-                    "Multiple XMP packets are present but "
-                    "xmp_packet_index was not specified, assuming "
-                    "xmp_packet_index=0"
-                )
-            xmp_packet_index = 0
-        elif xmp_packet_index >= len(start_positions):
-            raise IndexError(
-                f"xmp_packet was set to {xmp_packet_index} but only {len(start_positions)} "
-                "packets are present"
-            )
+    return packet
+
 
-        start = start_positions[xmp_packet_index] - 2
-        end = contents.index(b"</x:xmpmeta>", start) + 12
+def extract_xmp(image, xmp_packet_index=None):
+    """
+    Extract an XMP packet from an image.
+
+    ``image`` can be a filename, a binary file object, or a bytes-like object
+    containing the image. The format is determined from the first bytes of
+    the image, so it is only opened once.
+    """
 
-        return contents[start:end]
+    with open_image(image) as fileobj:
+        image_format = sniff_format(fileobj)
+
+        if image_format == "jpeg":
+            return _extract_jpeg(fileobj, xmp_packet_index)
+
+        elif image_format == "png":
+            return _extract_png(fileobj, xmp_packet_index)
+
+        elif image_format == "tiff":
+            return _extract_tiff(fileobj, xmp_packet_index)
+
+        elif image_format == "webp":
+            return _extract_webp(fileobj, xmp_packet_index)
+
+        elif image_format == "isobmff":
+            return _extract_isobmff(fileobj, xmp_packet_index)
+
+        else:
+            warnings.warn(
+                "Only JPEG, PNG, TIFF, WebP, HEIF/AVIF, and JPEG XL files can be "
+                "properly parsed - "
+                "scanning file contents for XMP packet"
+            )
+            return _scan_xmp(fileobj, xmp_packet_index)
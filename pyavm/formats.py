@@ -0,0 +1,53 @@
+# Detection of image formats
+
+import struct
+
+from .isobmff import IMAGE_BRANDS, JXL_CODESTREAM_SIGNATURE, JXL_SIGNATURE, ftyp_brands
+from .jpeg import JPEG_SIGNATURE
+from .png import PNG_SIGNATURE
+from .tiff import TIFF_SIGNATURES
+from .webp import RIFF_SIGNATURE, WEBP_SIGNATURE
+
+__all__ = ["sniff_format"]
+
+# Number of bytes needed to identify all supported formats
+
+HEADER_SIZE = 12
+
+# Maximum size of the 'ftyp' box read to find the brands of ISOBMFF files
+
+MAX_FTYP_SIZE = 4096
+
+
+def sniff_format(fileobj):
+    """
+    Determine the format of an image from its first bytes.
+
+    Returns ``'jpeg'``, ``'png'``, ``'tiff'``, ``'webp'``, ``'isobmff'``
+    (for HEIF, AVIF, JPEG XL, and JPEG 2000 files), or `None` if the format
+    is not recognized. Other files based on ISOBMFF, such as MP4 and
+    QuickTime movies, are not recognized. The file should be positioned at
+    the start of the image, and is positioned there again on return.
+    """
+
+    start = fileobj.tell()
+    header = fileobj.read(HEADER_SIZE)
+    fileobj.seek(start)
+
+    if header.startswith(JPEG_SIGNATURE):
+        return "jpeg"
+    elif header.startswith(PNG_SIGNATURE):
+        return "png"
+    elif header[:4] in TIFF_SIGNATURES:
+        return "tiff"
+    elif header[:4] == RIFF_SIGNATURE and header[8:12] == WEBP_SIGNATURE:
+        return "webp"
+    elif header[4:8] == b"ftyp":
+        size = min(struct.unpack(">I", header[:4])[0], MAX_FTYP_SIZE)
+        ftyp = fileobj.read(size)
+        fileobj.seek(start)
+        return "isobmff" if ftyp_brands(ftyp) & IMAGE_BRANDS else None
+    elif header == JXL_SIGNATURE or header.startswith(JXL_CODESTREAM_SIGNATURE):
+        return "isobmff"
+    else:
+        return None
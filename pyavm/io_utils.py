@@ -0,0 +1,194 @@
+# Utilities for reading and writing image files
+
+import os
+from contextlib import contextmanager
+from io import BytesIO
+
+__all__ = [
+    "is_filename",
+    "open_image",
+    "open_output",
+    "write_buffers",
+    "copy_range",
+    "write_at",
+]
+
+
+def is_filename(image):
+    """
+    Whether ``image`` is a filename rather than a file object or buffer.
+    """
+    return isinstance(image, (str, os.PathLike))
+
+
+@contextmanager
+def open_image(image):
+    """
+    Open an image for reading, returning a seekable binary file object.
+
+    ``image`` can be a filename, a binary file object, or a bytes-like
+    object (e.g. `bytes` or `memoryview`). File objects are read from the
+    start, and are not closed on exit. File objects that are not seekable
+    are read into memory.
+    """
+
+    if is_filename(image):
+        with open(image, "rb") as fileobj:
+            yield fileobj
+    elif hasattr(image, "read"):
+        if image.seekable():
+            image.seek(0)
+            yield image
+        else:
+            yield BytesIO(image.read())
+    else:
+        yield BytesIO(image)
+
+
+@contextmanager
+def open_output(image):
+    """
+    Open an image for writing.
+
+    ``image`` can be a filename or a binary file object (which is written to
+    at the current position, and is not closed on exit). If ``image`` is
+    `None`, a `BytesIO` object is returned.
+    """
+
+    if is_filename(image):
+        with open(image, "wb") as fileobj:
+            yield fileobj
+    elif image is None:
+        yield BytesIO()
+    else:
+        yield image
+
+
+# Maximum number of buffers to pass to a single writev call
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = 1024
+
+
+def _fileno(fileobj):
+    try:
+        return fileobj.fileno()
+    except (AttributeError, OSError):
+        return None
+
+
+def write_buffers(fileobj, buffers):
+    """
+    Write a sequence of buffers to a file.
+
+    If the file has a file descriptor, the buffers are written using
+    scatter-gather writes with `os.writev`, otherwise they are written one at
+    a time.
+    """
+
+    fd = _fileno(fileobj)
+
+    if fd is None or not hasattr(os, "writev"):
+        for buffer in buffers:
+            fileobj.write(buffer)
+        return
+
+    fileobj.flush()
+
+    buffers = [buffer for buffer in buffers if len(buffer) > 0]
+
+    for start in range(0, len(buffers), IOV_MAX):
+        batch = buffers[start : start + IOV_MAX]
+        while batch:
+            written = os.writev(fd, batch)
+            # In case of a partial write, drop the buffers that were fully
+            # written and retry with the remainder.
+            remaining = []
+            for buffer in batch:
+                if written >= len(buffer):
+                    written -= len(buffer)
+                else:
+                    remaining.append(memoryview(buffer)[written:])
+                    written = 0
+            batch = remaining
+
+
+def copy_range(fileobj_in, fileobj_out, offset, count=None, buffer_size=1 << 20):
+    """
+    Copy ``count`` bytes starting at ``offset`` in ``fileobj_in`` to the
+    current position in ``fileobj_out``.
+
+    If ``count`` is `None`, everything until the end of the input is copied.
+    Where possible, the data is copied by the kernel using
+    `os.copy_file_range` or `os.sendfile`, without passing through Python.
+    Otherwise, the data is copied through a buffer of ``buffer_size`` bytes.
+    """
+
+    if count is None:
+        fileobj_in.seek(0, os.SEEK_END)
+        count = fileobj_in.tell() - offset
+
+    if count <= 0:
+        return
+
+    fd_in = _fileno(fileobj_in)
+    fd_out = _fileno(fileobj_out)
+
+    if fd_in is not None and fd_out is not None:
+        fileobj_out.flush()
+
+        for method in ("copy_file_range", "sendfile"):
+            if not hasattr(os, method):
+                continue
+            try:
+                while count > 0:
+                    if method == "copy_file_range":
+                        copied = os.copy_file_range(fd_in, fd_out, count, offset_src=offset)
+                    else:
+                        copied = os.sendfile(fd_out, fd_in, offset, count)
+                    if copied == 0:
+                        return
+                    offset += copied
+                    count -= copied
+            except OSError:
+                # Not supported for this combination of files, so try the
+                # next method.
+                continue
+            else:
+                return
+
+    fileobj_in.seek(offset)
+
+    buffer = memoryview(bytearray(min(count, buffer_size)))
+
+    while count > 0:
+        read = fileobj_in.readinto(buffer[: min(count, len(buffer))])
+        if not read:
+            break
+        fileobj_out.write(buffer[:read])
+        count -= read
+
+
+def write_at(fileobj, offset, data):
+    """
+    Write ``data`` at ``offset`` in ``fileobj``, overwriting existing data.
+
+    Where available, this uses `os.pwrite`, which does not change the file
+    position.
+    """
+
+    fd = _fileno(fileobj)
+
+    if fd is None or not hasattr(os, "pwrite"):
+        fileobj.seek(offset)
+        fileobj.write(data)
+        return
+
+    fileobj.flush()
+
+    data = memoryview(data)
+    while len(data) > 0:
+        written = os.pwrite(fd, data, offset)
+        data = data[written:]
+        offset += written
@@ -0,0 +1,386 @@
+# Pure-python parser for the ISO base media file format (ISOBMFF), which is
+# the container used by HEIF/AVIF and JPEG XL files
+
+import struct
+from io import BytesIO
+
+# JPEG XL files either consist of a bare codestream, or of a container
+# starting with a signature box
+
+JXL_SIGNATURE = b"\x00\x00\x00\x0cJXL \r\n\x87\n"
+
+JXL_CODESTREAM_SIGNATURE = b"\xff\x0a"
+
+# XMP packets are stored in 'uuid' boxes with the following UUID, in 'xml '
+# boxes for JPEG XL files, and as 'mime' items in the 'meta' box for HEIF
+# and AVIF files.
+
+XMP_UUID = bytes.fromhex("be7acfcb97a942e89c71999491e3afac")
+
+XMP_CONTENT_TYPE = b"application/rdf+xml"
+
+# Brands of image formats based on ISOBMFF, which are identified by the major
+# or compatible brands in the 'ftyp' box. Other files using ISOBMFF, such as
+# MP4 and QuickTime movies, store XMP packets in other places.
+
+IMAGE_BRANDS = {
+    # HEIF
+    b"mif1",
+    b"mif2",
+    b"msf1",
+    b"heic",
+    b"heix",
+    b"heim",
+    b"heis",
+    b"hevc",
+    b"hevx",
+    # AVIF
+    b"avif",
+    b"avis",
+    b"avio",
+    # JPEG XL
+    b"jxl ",
+    # JPEG 2000
+    b"jp2 ",
+    b"jpx ",
+    b"jpm ",
+}
+
+
+def ftyp_brands(data):
+    """
+    Return the major and compatible brands in an 'ftyp' box.
+    """
+    payload = data[8:]
+    brands = {payload[:4]}
+    brands.update(payload[i : i + 4] for i in range(8, len(payload) - 3, 4))
+    return brands
+
+
+def box_header(box_type, payload_size):
+    """
+    Create the header for a box, using a 64-bit size if needed.
+    """
+    if payload_size + 8 > 0xFFFFFFFF:
+        return struct.pack(">I4sQ", 1, box_type, payload_size + 16)
+    return struct.pack(">I4s", payload_size + 8, box_type)
+
+
+def box(box_type, payload):
+    """
+    Create a box.
+    """
+    return box_header(box_type, len(payload)) + payload
+
+
+def full_box(box_type, version, flags, payload):
+    """
+    Create a full box, which has a version and flags.
+    """
+    return box(box_type, struct.pack(">I", (version << 24) | flags) + payload)
+
+
+def iter_boxes(fileobj, start, end):
+    """
+    Iterate over the boxes between ``start`` and ``end`` in a file, without
+    reading the box contents.
+
+    This yields ``(offset, size, header_size, type)`` for each box, where
+    ``offset`` is the position of the start of the box (including the
+    header), and ``size`` the size of the box including the header. The file
+    position may be changed between iterations.
+    """
+    offset = start
+    while offset < end:
+        fileobj.seek(offset)
+        header = fileobj.read(8)
+        if len(header) < 8:
+            raise ValueError("Unexpected end of file while reading box")
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            data = fileobj.read(8)
+            if len(data) < 8:
+                raise ValueError("Unexpected end of file while reading box")
+            (size,) = struct.unpack(">Q", data)
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            raise ValueError(f"Invalid size for '{box_type.decode('latin-1')}' box")
+        yield offset, size, header_size, box_type
+        offset += size
+
+
+def read_boxes(data, types=None):
+    """
+    Split the contents of a box into the boxes it contains.
+
+    Returns a list of ``(type, box)`` tuples, where ``box`` includes the
+    header. If ``types`` is given, only boxes with these types are returned.
+    """
+    fileobj = BytesIO(data)
+    boxes = []
+    for offset, size, _, box_type in iter_boxes(fileobj, 0, len(data)):
+        if types is None or box_type in types:
+            boxes.append((box_type, data[offset : offset + size]))
+    return boxes
+
+
+def _unpack_full_box(data):
+    # Return the version, flags, and payload of a full box
+    header_size = 16 if struct.unpack_from(">I", data)[0] == 1 else 8
+    (version_flags,) = struct.unpack_from(">I", data, header_size)
+    return version_flags >> 24, version_flags & 0xFFFFFF, data[header_size + 4 :]
+
+
+def _unpack_uint(data, offset, size):
+    if size == 0:
+        return 0, offset
+    value = int.from_bytes(data[offset : offset + size], "big")
+    return value, offset + size
+
+
+class ItemInfo:
+    """
+    An item in an 'iinf' box.
+
+    The ``box`` attribute contains the original 'infe' box, so that items
+    can be written out unchanged.
+    """
+
+    def __init__(self, item_id, item_type, content_type, box):
+        self.item_id = item_id
+        self.item_type = item_type
+        self.content_type = content_type
+        self.box = box
+
+    @property
+    def is_xmp(self):
+        return self.item_type == b"mime" and self.content_type == XMP_CONTENT_TYPE
+
+    @classmethod
+    def from_box(cls, data):
+        version, _, payload = _unpack_full_box(data)
+        if version < 2:
+            # Item ID, protection index, and name followed by content type
+            (item_id,) = struct.unpack_from(">H", payload)
+            strings = payload[4:].split(b"\x00")
+            content_type = strings[1] if len(strings) > 1 else None
+            return cls(item_id, b"mime" if content_type else None, content_type, data)
+        if version == 2:
+            item_id, _, item_type = struct.unpack_from(">HH4s", payload)
+            rest = payload[8:]
+        else:
+            item_id, _, item_type = struct.unpack_from(">IH4s", payload)
+            rest = payload[10:]
+        content_type = None
+        if item_type == b"mime":
+            # Item name followed by content type
+            content_type = rest.split(b"\x00")[1]
+        return cls(item_id, item_type, content_type, data)
+
+    @classmethod
+    def for_xmp(cls, item_id):
+        if item_id > 0xFFFF:
+            payload = struct.pack(">IH4s", item_id, 0, b"mime")
+            version = 3
+        else:
+            payload = struct.pack(">HH4s", item_id, 0, b"mime")
+            version = 2
+        payload += b"\x00" + XMP_CONTENT_TYPE + b"\x00"
+        return cls(item_id, b"mime", XMP_CONTENT_TYPE, full_box(b"infe", version, 0, payload))
+
+
+def read_iinf(data):
+    """
+    Read the items in an 'iinf' box.
+
+    Returns the version of the box and a list of `ItemInfo` objects.
+    """
+    version, _, payload = _unpack_full_box(data)
+    count_size = 2 if version == 0 else 4
+    return version, [
+        ItemInfo.from_box(infe) for _, infe in read_boxes(payload[count_size:], {b"infe"})
+    ]
+
+
+def pack_iinf(version, items):
+    count = struct.pack(">H" if version == 0 else ">I", len(items))
+    return full_box(b"iinf", version, 0, count + b"".join(item.box for item in items))
+
+
+class ItemLocation:
+    """
+    The location of an item in an 'iloc' box.
+
+    ``extents`` is a list of ``(index, offset, length)`` tuples. For items
+    with a ``construction_method`` of 0, the offsets are relative to the
+    start of the file, and for 1 relative to the start of the 'idat' data.
+    """
+
+    def __init__(self, item_id, construction_method, data_reference_index, base_offset, extents):
+        self.item_id = item_id
+        self.construction_method = construction_method
+        self.data_reference_index = data_reference_index
+        self.base_offset = base_offset
+        self.extents = extents
+
+
+def read_iloc(data):
+    """
+    Read the item locations in an 'iloc' box.
+
+    Returns the version of the box and a list of `ItemLocation` objects.
+    """
+
+    version, _, payload = _unpack_full_box(data)
+
+    offset_size = payload[0] >> 4
+    length_size = payload[0] & 0xF
+    base_offset_size = payload[1] >> 4
+    index_size = payload[1] & 0xF if version > 0 else 0
+
+    if version < 2:
+        (count,) = struct.unpack_from(">H", payload, 2)
+        pos = 4
+    else:
+        (count,) = struct.unpack_from(">I", payload, 2)
+        pos = 6
+
+    items = []
+    for _ in range(count):
+        item_id, pos = _unpack_uint(payload, pos, 2 if version < 2 else 4)
+        construction_method = 0
+        if version > 0:
+            value, pos = _unpack_uint(payload, pos, 2)
+            construction_method = value & 0xF
+        data_reference_index, pos = _unpack_uint(payload, pos, 2)
+        base_offset, pos = _unpack_uint(payload, pos, base_offset_size)
+        extent_count, pos = _unpack_uint(payload, pos, 2)
+        extents = []
+        for _ in range(extent_count):
+            index, pos = _unpack_uint(payload, pos, index_size)
+            extent_offset, pos = _unpack_uint(payload, pos, offset_size)
+            extent_length, pos = _unpack_uint(payload, pos, length_size)
+            extents.append((index, extent_offset, extent_length))
+        items.append(
+            ItemLocation(item_id, construction_method, data_reference_index, base_offset, extents)
+        )
+
+    if pos > len(payload):
+        raise ValueError("Unexpected end of 'iloc' box")
+
+    return version, items
+
+
+def pack_iloc(version, items):
+    """
+    Create an 'iloc' box, using 4-byte or 8-byte fields as needed.
+    """
+
+    def field_size(values):
+        return 8 if any(value > 0xFFFFFFFF for value in values) else 4
+
+    offset_size = field_size(offset for item in items for _, offset, _ in item.extents)
+    length_size = field_size(length for item in items for _, _, length in item.extents)
+    base_offset_size = field_size(item.base_offset for item in items)
+
+    indices = [index for item in items for index, _, _ in item.extents]
+    index_size = field_size(indices) if any(indices) else 0
+
+    if any(item.item_id > 0xFFFF for item in items):
+        version = 2
+
+    parts = [
+        bytes([offset_size << 4 | length_size, base_offset_size << 4 | index_size]),
+        struct.pack(">H" if version < 2 else ">I", len(items)),
+    ]
+
+    for item in items:
+        parts.append(item.item_id.to_bytes(2 if version < 2 else 4, "big"))
+        if version > 0:
+            parts.append(struct.pack(">H", item.construction_method))
+        parts.append(struct.pack(">H", item.data_reference_index))
+        parts.append(item.base_offset.to_bytes(base_offset_size, "big"))
+        parts.append(struct.pack(">H", len(item.extents)))
+        for index, extent_offset, extent_length in item.extents:
+            if version > 0 and index_size > 0:
+                parts.append(index.to_bytes(index_size, "big"))
+            parts.append(extent_offset.to_bytes(offset_size, "big"))
+            parts.append(extent_length.to_bytes(length_size, "big"))
+
+    return full_box(b"iloc", version, 0, b"".join(parts))
+
+
+def read_iref(data):
+    """
+    Read the references in an 'iref' box.
+
+    Returns the version of the box and a list of ``(type, from_id, to_ids)``
+    tuples.
+    """
+    version, _, payload = _unpack_full_box(data)
+    id_size = 2 if version == 0 else 4
+    references = []
+    for ref_type, ref in read_boxes(payload):
+        pos = 16 if struct.unpack_from(">I", ref)[0] == 1 else 8
+        from_id, pos = _unpack_uint(ref, pos, id_size)
+        count, pos = _unpack_uint(ref, pos, 2)
+        to_ids = []
+        for _ in range(count):
+            to_id, pos = _unpack_uint(ref, pos, id_size)
+            to_ids.append(to_id)
+        references.append((ref_type, from_id, to_ids))
+    return version, references
+
+
+def pack_iref(version, references):
+    if any(item_id > 0xFFFF for _, from_id, to_ids in references for item_id in [from_id] + to_ids):
+        version = 1
+    id_size = 2 if version == 0 else 4
+    boxes = []
+    for ref_type, from_id, to_ids in references:
+        payload = from_id.to_bytes(id_size, "big") + struct.pack(">H", len(to_ids))
+        payload += b"".join(to_id.to_bytes(id_size, "big") for to_id in to_ids)
+        boxes.append(box(ref_type, payload))
+    return full_box(b"iref", version, 0, b"".join(boxes))
+
+
+def read_pitm(data):
+    """
+    Return the ID of the primary item from a 'pitm' box.
+    """
+    version, _, payload = _unpack_full_box(data)
+    return _unpack_uint(payload, 0, 2 if version == 0 else 4)[0]
+
+
+def meta_children(data):
+    """
+    Split a 'meta' box into the boxes it contains.
+
+    Returns the version and flags of the box and a list of ``(type, box)``
+    tuples.
+    """
+    version, flags, payload = _unpack_full_box(data)
+    return version, flags, read_boxes(payload)
+
+
+def item_data(fileobj, location, idat=None):
+    """
+    Read the data for an item from the extents given by its location.
+    """
+    parts = []
+    for _, extent_offset, extent_length in location.extents:
+        offset = location.base_offset + extent_offset
+        if location.construction_method == 0:
+            fileobj.seek(offset)
+            data = fileobj.read(extent_length)
+        elif location.construction_method == 1 and idat is not None:
+            data = idat[offset : offset + extent_length]
+        else:
+            raise ValueError(f"Unsupported construction method ({location.construction_method})")
+        if len(data) < extent_length:
+            raise ValueError("Unexpected end of file while reading item data")
+        parts.append(data)
+    return b"".join(parts)
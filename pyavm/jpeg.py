@@ -1,17 +1,31 @@
 # Pure-python JPEG parser
 # Copyright (c) 2013 Thomas P. Robitaille
 
+import re
+import struct
 
-# Define common markers
+from .io_utils import write_buffers
+
+# Define markers (see Table B.1 of ITU T.81)
 
 MARKERS = {
-    b"\xd8": "SOI",
+    b"\x01": "TEM",
     b"\xc0": "SOF0",
+    b"\xc1": "SOF1",
     b"\xc2": "SOF2",
+    b"\xc3": "SOF3",
     b"\xc4": "DHT",
-    b"\xdb": "DQT",
-    b"\xdd": "DRI",
-    b"\xda": "SOS",
+    b"\xc5": "SOF5",
+    b"\xc6": "SOF6",
+    b"\xc7": "SOF7",
+    b"\xc8": "JPG",
+    b"\xc9": "SOF9",
+    b"\xca": "SOF10",
+    b"\xcb": "SOF11",
+    b"\xcc": "DAC",
+    b"\xcd": "SOF13",
+    b"\xce": "SOF14",
+    b"\xcf": "SOF15",
     b"\xd0": "RST0",
     b"\xd1": "RST1",
     b"\xd2": "RST2",
@@ -20,6 +34,14 @@ MARKERS = {
     b"\xd5": "RST5",
     b"\xd6": "RST6",
     b"\xd7": "RST7",
+    b"\xd8": "SOI",
+    b"\xd9": "EOI",
+    b"\xda": "SOS",
+    b"\xdb": "DQT",
+    b"\xdc": "DNL",
+    b"\xdd": "DRI",
+    b"\xde": "DHP",
+    b"\xdf": "EXP",
     b"\xe0": "APP0",
     b"\xe1": "APP1",
     b"\xe2": "APP2",
@@ -30,26 +52,70 @@ MARKERS = {
     b"\xe7": "APP7",
     b"\xe8": "APP8",
     b"\xe9": "APP9",
+    b"\xea": "APP10",
+    b"\xeb": "APP11",
+    b"\xec": "APP12",
+    b"\xed": "APP13",
+    b"\xee": "APP14",
+    b"\xef": "APP15",
+    b"\xf0": "JPG0",
+    b"\xf1": "JPG1",
+    b"\xf2": "JPG2",
+    b"\xf3": "JPG3",
+    b"\xf4": "JPG4",
+    b"\xf5": "JPG5",
+    b"\xf6": "JPG6",
+    b"\xf7": "JPG7",
+    b"\xf8": "JPG8",
+    b"\xf9": "JPG9",
+    b"\xfa": "JPG10",
+    b"\xfb": "JPG11",
+    b"\xfc": "JPG12",
+    b"\xfd": "JPG13",
     b"\xfe": "COM",
-    b"\xd9": "EOI",
 }
 
-# Define some markers which are always followed by variable-length data
+# Markers which are not followed by a length field. All other markers are
+# followed by a two-byte big-endian length which includes the length field
+# itself but not the marker.
+
+STANDALONE = {b"\x01", b"\xd8", b"\xd9"} | {bytes([0xD0 + i]) for i in range(8)}
+
+# JPEG files start with an SOI marker immediately followed by another marker
+
+JPEG_SIGNATURE = b"\xff\xd8\xff"
+
+XMP_NAMESPACE = b"http://ns.adobe.com/xap/1.0/"
+
+# XMP packets that do not fit in a single segment are split into a standard
+# packet and extended XMP, which is stored in one or more extension segments
+# (see Part 3 of the XMP specification).
+
+XMP_EXTENSION_NAMESPACE = b"http://ns.adobe.com/xmp/extension/"
+
+MAX_XMP_PACKET_SIZE = 65502
+
+MAX_EXTENDED_XMP_PORTION_SIZE = 65400
+
+# The entropy-coded data following an SOS marker segment ends at the first
+# marker other than RST0-7. Within the data, 0xff bytes are followed by 0x00
+# (byte stuffing) or 0xff (fill bytes).
 
-VARIABLE = ["APP0", "APP1", "APP2", "APP3", "APP4", "APP5", "APP6", "APP7", "APP8", "APP9"]
+SCAN_END = re.compile(b"\xff[^\x00\xd0-\xd7\xff]")
 
 
 def is_jpeg(filename):
     with open(filename, "rb") as f:
-        return f.read(3) == b"\xff\xd8\xff"
+        return f.read(3) == JPEG_SIGNATURE
 
 
 class JPEGSegment:
     @classmethod
     def from_bytes(cls, bytes):
         self = cls()
-        if bytes[1:2] in MARKERS:
-            self.type = MARKERS[bytes[1:2]]
+        marker = bytes[1:2].tobytes() if isinstance(bytes, memoryview) else bytes[1:2]
+        if marker in MARKERS:
+            self.type = MARKERS[marker]
         else:
             self.type = "UNKNOWN"
         self.bytes = bytes
@@ -58,37 +124,254 @@ class JPEGSegment:
     def write(self, fileobj):
         fileobj.write(self.bytes)
 
+    @property
+    def is_xmp(self):
+        return self.type == "APP1" and self.bytes[4:32] == XMP_NAMESPACE
+
+    @property
+    def is_extended_xmp(self):
+        return self.type == "APP1" and self.bytes[4:39] == XMP_EXTENSION_NAMESPACE + b"\x00"
+
+
+def xmp_segment(xmp_packet):
+    """
+    Create an APP1 segment containing an XMP packet.
+    """
+
+    if len(xmp_packet) > MAX_XMP_PACKET_SIZE:
+        raise ValueError("XMP packet is too long to embed in JPG file")
+
+    segment = JPEGSegment()
+
+    segment.bytes = b"".join(
+        [
+            # APP1 marker
+            b"\xff\xe1",
+            # Length of XMP packet + 2 + 29
+            struct.pack(">H", len(xmp_packet) + 29 + 2),
+            # XMP Namespace URI (NULL-terminated)
+            XMP_NAMESPACE + b"\x00",
+            # XMP packet
+            xmp_packet,
+        ]
+    )
+
+    segment.type = "APP1"
+
+    return segment
+
+
+def extended_xmp_segments(extended_xmp, guid):
+    """
+    Create the APP1 segments containing extended XMP.
+
+    ``guid`` should be the 32-character hexadecimal MD5 digest of the
+    extended XMP, as referenced by xmpNote:HasExtendedXMP in the standard XMP
+    packet.
+    """
+
+    segments = []
+
+    for offset in range(0, len(extended_xmp), MAX_EXTENDED_XMP_PORTION_SIZE):
+        portion = extended_xmp[offset : offset + MAX_EXTENDED_XMP_PORTION_SIZE]
+
+        segment = JPEGSegment()
+
+        segment.bytes = b"".join(
+            [
+                # APP1 marker
+                b"\xff\xe1",
+                # Length of portion + 2 + 35 + 32 + 4 + 4
+                struct.pack(">H", len(portion) + 77),
+                # Extension Namespace URI (NULL-terminated)
+                XMP_EXTENSION_NAMESPACE + b"\x00",
+                # GUID, full length of extended XMP, and offset of portion
+                guid,
+                struct.pack(">II", len(extended_xmp), offset),
+                # Portion of the extended XMP
+                portion,
+            ]
+        )
+
+        segment.type = "APP1"
+
+        segments.append(segment)
+
+    return segments
+
+
+def read_extended_xmp(segments, guid):
+    """
+    Reassemble the extended XMP with the given GUID from APP1 extension
+    segments.
+
+    Returns a ``bytearray`` containing the extended XMP, or `None` if no
+    segments have this GUID. The portions are copied directly into a buffer
+    preallocated using the full length given in the segments, once this
+    length has been checked against the size of the portions present.
+    """
+
+    full_length = None
+    portions = []
+
+    for segment in segments:
+        if not segment.is_extended_xmp or segment.bytes[39:71] != guid:
+            continue
+
+        length, offset = struct.unpack_from(">II", segment.bytes, 71)
+        portion = memoryview(segment.bytes)[79:]
+
+        if full_length is None:
+            full_length = length
+
+        if length != full_length or offset + len(portion) > full_length:
+            raise ValueError("Extended XMP segments have inconsistent lengths")
+
+        portions.append((offset, portion))
+
+    if full_length is None:
+        return None
+
+    if full_length > sum(len(portion) for _, portion in portions):
+        raise ValueError("Extended XMP segments are incomplete")
+
+    buffer = bytearray(full_length)
+
+    for offset, portion in portions:
+        buffer[offset : offset + len(portion)] = portion
+
+    return buffer
+
+
+def read_header_segments(fileobj):
+    """
+    Read the marker segments that precede the first SOS (or EOI) marker.
+
+    Segments are located using the lengths they declare, so only the header
+    is read from the file, independently of the size of the compressed image
+    data. On return, the file is positioned at the start of the SOS marker.
+    The position of each segment in the file is given by its ``offset``
+    attribute.
+    """
+
+    segments = []
+
+    while True:
+        marker = fileobj.read(2)
+
+        # Bytes between segments are skipped until the next marker, as done
+        # by libjpeg (but the file should start with a marker)
+        if segments:
+            while marker[:1] not in (b"\xff", b""):
+                marker = marker[1:] + fileobj.read(1)
+
+        if len(marker) < 2 or marker[:1] != b"\xff":
+            raise ValueError(f"Expected JPEG marker at offset {fileobj.tell() - len(marker)}")
+
+        # Markers may be preceded by any number of 0xff fill bytes
+        while marker[1:2] == b"\xff":
+            marker = b"\xff" + fileobj.read(1)
+            if len(marker) < 2:
+                raise ValueError("Unexpected end of file while reading JPEG marker")
+
+        if marker[1:2] in (b"\xda", b"\xd9"):
+            fileobj.seek(-2, 1)
+            break
+
+        if marker[1:2] in STANDALONE:
+            segment = JPEGSegment.from_bytes(marker)
+        else:
+            length = fileobj.read(2)
+            if len(length) < 2:
+                raise ValueError("Unexpected end of file while reading JPEG segment length")
+
+            (size,) = struct.unpack(">H", length)
+            if size < 2:
+                raise ValueError(f"Invalid JPEG segment length ({size})")
+
+            data = fileobj.read(size - 2)
+            if len(data) < size - 2:
+                raise ValueError("Unexpected end of file while reading JPEG segment")
+
+            segment = JPEGSegment.from_bytes(marker + length + data)
+
+        segment.offset = fileobj.tell() - len(segment.bytes)
+        segments.append(segment)
+
+    return segments
+
 
 class JPEGFile:
     @classmethod
     def read(cls, filename):
+        """
+        Read a JPEG file.
+        """
         with open(filename, "rb") as fileobj:
-            contents = fileobj.read()
+            return cls.from_bytes(fileobj.read())
 
-        self = cls()
+    @classmethod
+    def from_bytes(cls, contents):
+        """
+        Split the contents of a JPEG file into segments.
+
+        Marker segments are delimited using the length they declare, and the
+        entropy-coded data following each SOS marker segment (including any
+        RST markers) is kept in the SOS segment, so the number of operations
+        scales with the number of segments rather than the size of the file.
+        Any data following the EOI marker is kept in the EOI segment.
 
-        # Search for all starts of segments. Segments all start with 0xff, but
-        # we should ignore 0xff instances that are followed by 0x00.
+        If ``contents`` is a `memoryview`, the bytes of each segment are views
+        into it rather than copies.
+        """
 
+        self = cls()
         self.segments = []
 
-        start = end = 0
-        while True:
-            if (
-                contents[start + 1 : start + 2] in MARKERS
-                and MARKERS[contents[start + 1 : start + 2]] in VARIABLE
-            ):
-                end = contents.find(b"\xff", end + 4)
+        pos = 0
+        size = len(contents)
+
+        while pos < size:
+            if contents[pos] != 0xFF:
+                # Data that is not part of any segment - we keep it attached to
+                # the previous segment so that it is written out unchanged.
+                match = SCAN_END.search(contents, pos)
+                end = match.start() if match else size
+                if not self.segments:
+                    raise ValueError("Image did not start with SOI")
+                self.segments[-1].bytes = bytes(self.segments[-1].bytes) + contents[pos:end]
+                pos = end
+                continue
+
+            # Skip any fill bytes preceding the marker
+            while contents[pos + 1 : pos + 2] == b"\xff":
+                pos += 1
+
+            marker = bytes(contents[pos + 1 : pos + 2])
+
+            if marker == b"\xd9":
+                end = size
+            elif marker in STANDALONE:
+                end = pos + 2
             else:
-                end = contents.find(b"\xff", end + 1)
-            if end == -1 or contents[end + 1 : end + 2] not in [b"\xff", b"\x00"]:
-                if end == -1:
-                    end = len(contents) + 1
-                self.segments.append(JPEGSegment.from_bytes(contents[start:end]))
-                if end == len(contents) + 1:
-                    break
-                else:
-                    start = end
+                if pos + 4 > size:
+                    raise ValueError("Unexpected end of file while reading JPEG segment length")
+                (length,) = struct.unpack_from(">H", contents, pos + 2)
+                if length < 2:
+                    raise ValueError(f"Invalid JPEG segment length ({length})")
+                end = pos + 2 + length
+                if end > size:
+                    raise ValueError("Unexpected end of file while reading JPEG segment")
+                if marker == b"\xda":
+                    match = SCAN_END.search(contents, end)
+                    end = match.start() if match else size
+
+            self.segments.append(JPEGSegment.from_bytes(contents[pos:end]))
+
+            pos = end
+
+        if not self.segments:
+            raise ValueError("Image did not contain any JPEG segments")
 
         if self.segments[0].type != "SOI":
             raise ValueError(f"Image did not start with SOI but with {self.segments[0].type}")
@@ -100,5 +383,4 @@ class JPEGFile:
 
     def write(self, filename):
         with open(filename, "wb") as fileobj:
-            for segment in self.segments:
-                segment.write(fileobj)
+            write_buffers(fileobj, [segment.bytes for segment in self.segments])
@@ -2,19 +2,144 @@
 # Copyright (c) 2013 Thomas P. Robitaille
 
 import struct
+import zlib
 from zlib import crc32
 
+from .io_utils import write_buffers
+
 PNG_SIGNATURE = b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a"
 
+# Chunks containing meta-data (rather than image data)
+
+METADATA_CHUNKS = {b"iTXt", b"tEXt", b"zTXt", b"eXIf"}
+
+# Keyword used for iTXt chunks containing XMP packets
+
+XMP_KEYWORD = b"XML:com.adobe.xmp"
+
+# Policies for verifying chunk CRCs when reading
+
+VERIFY = ["all", "metadata", "none"]
+
+
+def _check_verify(verify):
+    if verify not in VERIFY:
+        raise ValueError(f"verify should be one of {VERIFY}")
+
+
+def _should_verify(verify, chunk_type):
+    return verify == "all" or (verify == "metadata" and chunk_type in METADATA_CHUNKS)
+
 
 def is_png(filename):
     with open(filename, "rb") as f:
-        return f.read(8) == b"\x89\x50\x4e\x47\x0d\x0a\x1a\x0a"
+        return f.read(8) == PNG_SIGNATURE
+
+
+def iter_chunks(fileobj):
+    """
+    Iterate over the chunks in a PNG file, without reading the chunk data.
+
+    The file should be positioned after the signature. This yields
+    ``(offset, length, type)`` for each chunk, where ``offset`` is the
+    position of the start of the chunk (including the length field) in the
+    file. The file position may be changed between iterations.
+    """
+    offset = fileobj.tell()
+    while True:
+        fileobj.seek(offset)
+        header = fileobj.read(8)
+        if len(header) < 8:
+            raise ValueError("Unexpected end of file while reading PNG chunk")
+        length, chunk_type = struct.unpack(">I4s", header)
+        yield offset, length, chunk_type
+        if chunk_type == b"IEND":
+            break
+        offset += 12 + length
+
+
+def read_chunks(fileobj, types, verify="all"):
+    """
+    Read chunks of the given types from a PNG file.
+
+    The file should be positioned after the signature. Only the data for
+    chunks with a type in ``types`` is read - for other chunks, we seek past
+    the data using the declared chunk length. ``verify`` determines whether
+    the CRC of the chunks that are read is checked (see `PNGFile.read`).
+    """
+    _check_verify(verify)
+    chunks = []
+    for offset, length, chunk_type in iter_chunks(fileobj):
+        if chunk_type in types:
+            fileobj.seek(offset)
+            chunks.append(PNGChunk.read(fileobj, verify=_should_verify(verify, chunk_type)))
+    return chunks
+
+
+def parse_itxt(data):
+    """
+    Parse the header of an iTXt chunk.
+
+    Returns the keyword, whether the text is compressed, and the offset of
+    the text in the chunk data. ``data`` only needs to include the header,
+    and a `ValueError` is raised if the header is incomplete.
+    """
+    data = bytes(data)
+    keyword_end = data.index(b"\x00")
+    if len(data) < keyword_end + 3:
+        raise ValueError("iTXt chunk header is incomplete")
+    compressed = data[keyword_end + 1] == 1
+    language_end = data.index(b"\x00", keyword_end + 3)
+    text_start = data.index(b"\x00", language_end + 1) + 1
+    return data[:keyword_end], compressed, text_start
+
+
+def itxt_text(data, block_size=1 << 16):
+    """
+    Return the text of an iTXt chunk, decompressing it if needed.
+
+    Compressed text is decompressed incrementally, ``block_size`` bytes of
+    compressed data at a time.
+    """
+    _, compressed, text_start = parse_itxt(data)
+    text = memoryview(data)[text_start:]
+    if not compressed:
+        return text.tobytes()
+    decompressor = zlib.decompressobj()
+    parts = []
+    for start in range(0, len(text), block_size):
+        parts.append(decompressor.decompress(text[start : start + block_size]))
+    parts.append(decompressor.flush())
+    if not decompressor.eof:
+        raise ValueError("Compressed iTXt chunk text is incomplete")
+    return b"".join(parts)
+
+
+def itxt_chunk(keyword, text, compress=False):
+    """
+    Create an iTXt chunk, optionally compressing the text with zlib.
+    """
+    chunk = PNGChunk()
+    chunk.type = b"iTXt"
+    chunk.data = b"".join(
+        [
+            keyword,
+            b"\x00",  # Null separator
+            b"\x01" if compress else b"\x00",  # Compression flag
+            b"\x00",  # Compression method
+            b"\x00",  # Null separator (empty language tag)
+            b"\x00",  # Null separator (empty translated keyword)
+            zlib.compress(text) if compress else text,
+        ]
+    )
+    return chunk
 
 
 class PNGChunk:
+    _crc = None
+
     @classmethod
-    def read(cls, fileobj):
+    def read(cls, fileobj, verify=True):
         self = cls()
 
         # Read in chunk length
@@ -30,8 +155,11 @@ class PNGChunk:
         crc = struct.unpack(">I", fileobj.read(4))[0]
 
         # Check that the CRC matches the actual one
-        if crc != self.crc:
-            raise ValueError(f"CRC ({self.crc}) does not match advertised ({crc})")
+        if verify:
+            if crc != self.crc:
+                raise ValueError(f"CRC ({self.crc}) does not match advertised ({crc})")
+        else:
+            self._crc = crc
 
         if length != self.length:
             raise ValueError(
@@ -40,22 +168,73 @@ class PNGChunk:
 
         return self
 
+    @classmethod
+    def from_bytes(cls, contents, offset, verify=True):
+        """
+        Read a chunk starting at ``offset`` in ``contents``.
+
+        If ``contents`` is a `memoryview`, the chunk data is a view into it
+        rather than a copy.
+        """
+        self = cls()
+
+        if offset + 12 > len(contents):
+            raise ValueError("Unexpected end of file while reading PNG chunk")
+
+        length, self.type = struct.unpack_from(">I4s", contents, offset)
+
+        if offset + 12 + length > len(contents):
+            raise ValueError("Unexpected end of file while reading PNG chunk")
+
+        self.data = contents[offset + 8 : offset + 8 + length]
+
+        (crc,) = struct.unpack_from(">I", contents, offset + 8 + length)
+
+        if verify:
+            if crc != self.crc:
+                raise ValueError(f"CRC ({self.crc}) does not match advertised ({crc})")
+        else:
+            self._crc = crc
+
+        return self
+
     def write(self, fileobj):
-        # Write length
-        fileobj.write(struct.pack(">I", self.length))
+        write_buffers(fileobj, self.buffers())
 
-        # Write type
-        fileobj.write(self.type)
+    def buffers(self):
+        """
+        Return the length, type, data, and CRC of the chunk as separate
+        buffers, in the order in which they should be written.
+        """
+        return [struct.pack(">I", self.length), self.type, self.data, struct.pack(">I", self.crc)]
 
-        # Write data
-        fileobj.write(self.data)
+    # The CRC is cached once computed (or read from a file without being
+    # verified), so we reset it whenever the type or data are changed. Note
+    # that modifying the data in-place (e.g. for a bytearray) is not detected.
 
-        # Write CRC
-        fileobj.write(struct.pack(">I", self.crc))
+    @property
+    def type(self):
+        return self._type
+
+    @type.setter
+    def type(self, value):
+        self._type = value
+        self._crc = None
+
+    @property
+    def data(self):
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._crc = None
 
     @property
     def crc(self):
-        return crc32(self.type + self.data) & 0xFFFFFFFF
+        if self._crc is None:
+            self._crc = crc32(self.data, crc32(self.type)) & 0xFFFFFFFF
+        return self._crc
 
     @property
     def length(self):
@@ -64,7 +243,17 @@ class PNGChunk:
 
 class PNGFile:
     @classmethod
-    def read(cls, filename):
+    def read(cls, filename, verify="all"):
+        """
+        Read a PNG file.
+
+        ``verify`` determines which chunk CRCs are checked, and can be
+        ``'all'``, ``'metadata'`` (only text and EXIF chunks), or ``'none'``.
+        CRCs that are not checked are kept as-is when writing the file.
+        """
+
+        _check_verify(verify)
+
         with open(filename, "rb") as fileobj:
             self = cls()
 
@@ -77,16 +266,52 @@ class PNGFile:
             self.chunks = []
 
             while True:
-                chunk = PNGChunk.read(fileobj)
+                # Peek at the chunk type to decide whether to verify the CRC
+                header = fileobj.read(8)
+                if len(header) < 8:
+                    raise ValueError("Unexpected end of file while reading PNG chunk")
+                fileobj.seek(-8, 1)
+                chunk = PNGChunk.read(fileobj, verify=_should_verify(verify, header[4:]))
                 self.chunks.append(chunk)
                 if chunk.type == b"IEND":
                     break
 
         return self
 
+    @classmethod
+    def from_bytes(cls, contents, verify="all"):
+        """
+        Split the contents of a PNG file into chunks.
+
+        If ``contents`` is a `memoryview`, the data of each chunk is a view
+        into it rather than a copy.
+        """
+
+        _check_verify(verify)
+
+        self = cls()
+
+        sig = bytes(contents[:8])
+
+        if sig != PNG_SIGNATURE:
+            raise ValueError(f"Signature ({sig}) does match expected ({PNG_SIGNATURE})")
+
+        self.chunks = []
+
+        offset = 8
+        while True:
+            chunk_type = bytes(contents[offset + 4 : offset + 8])
+            chunk = PNGChunk.from_bytes(contents, offset, verify=_should_verify(verify, chunk_type))
+            self.chunks.append(chunk)
+            if chunk.type == b"IEND":
+                break
+            offset += 12 + chunk.length
+
+        return self
+
     def write(self, filename):
+        buffers = [PNG_SIGNATURE]
+        for chunk in self.chunks:
+            buffers.extend(chunk.buffers())
         with open(filename, "wb") as fileobj:
-            fileobj.write(PNG_SIGNATURE)
-
-            for chunk in self.chunks:
-                chunk.write(fileobj)
+            write_buffers(fileobj, buffers)
@@ -0,0 +1,141 @@
+# Compact representation of AVM meta-data, for holding many records in memory
+
+import sys
+
+from .avm import AVM, AVMContainer
+from .specs import SPECS
+
+__all__ = ["AVMRecord"]
+
+# All the tags in any version of the standard, in the order in which they are
+# defined in the specifications. Each tag corresponds to one bit in the mask
+# of a record.
+
+FIELDS = tuple(dict.fromkeys(name for specs in SPECS.values() for name in specs))
+
+_BITS = {name: 1 << index for index, name in enumerate(FIELDS)}
+
+
+def _compact(value):
+    # Lists are stored as tuples, and strings are interned so that values
+    # that are repeated between records (such as the publisher, facility, or
+    # controlled vocabulary terms) are only stored once
+    if isinstance(value, str):
+        return sys.intern(value)
+    elif isinstance(value, list):
+        return tuple(sys.intern(x) if isinstance(x, str) else x for x in value)
+    else:
+        return value
+
+
+class AVMRecord:
+    """
+    A compact, read-only representation of the tags set in an AVM object.
+
+    Only the tags that are set are stored, in a tuple ordered as in the
+    specifications, along with a bitmask indicating which tags these are.
+    This uses much less memory than an `AVM` object, for example to hold
+    the meta-data of many images at once:
+
+        >>> records = [AVMRecord.from_avm(AVM.from_image(f)) for f in filenames]
+        >>> records[0]["Spatial.Equinox"]
+        'J2000'
+
+    Lists are stored as tuples, and are converted back to lists by
+    :meth:`to_avm`. Strings are interned, so repeated values are shared
+    between records.
+    """
+
+    __slots__ = ("version", "mask", "values")
+
+    def __init__(self, version=1.2, mask=0, values=()):
+        self.version = version
+        self.mask = mask
+        self.values = values
+
+    @classmethod
+    def from_avm(cls, avm):
+        """
+        Create a record from an AVM object.
+
+        Parameters
+        ----------
+        avm : `AVM`
+            The AVM object. Values that are not yet validated (for objects
+            read with ``lazy=True``) are validated first.
+        """
+        found = dict(avm.items())
+        mask = 0
+        values = []
+        for name in FIELDS:
+            if name in found:
+                mask |= _BITS[name]
+                values.append(_compact(found[name]))
+        return cls(avm._layout, mask, tuple(values))
+
+    def to_avm(self, cls=AVM):
+        """
+        Create an AVM object from the record.
+
+        The values are set as they were in the original object, without
+        being validated again.
+
+        Parameters
+        ----------
+        cls : type, optional
+            The class of the AVM object to create, which should be `AVM` or
+            a subclass of it.
+        """
+
+        avm = cls(version=self.version)
+
+        for name, value in self.items():
+            if isinstance(value, tuple):
+                value = list(value)
+            group, _, key = name.partition(".")
+            if key:
+                avm._items[group]._set_item(key, value)
+            elif isinstance(avm._items.get(name), AVMContainer):
+                avm._items[name].value = value
+            elif name in avm._items:
+                avm._set_item(name, value)
+            else:
+                # Groups with a value are kept when changing to a version
+                # in which they are not defined
+                avm._items[name] = AVMContainer(allow_value=True, parent=avm, name=name)
+                avm._items[name].value = value
+
+        if avm.MetadataVersion != self.version:
+            avm._switch_classes()
+
+        return avm
+
+    def __getitem__(self, name):
+        bit = _BITS.get(name)
+        if bit is None:
+            raise KeyError(name)
+        if not self.mask & bit:
+            return None
+        return self.values[(self.mask & (bit - 1)).bit_count()]
+
+    def items(self):
+        """
+        Return an iterator over (tag_name, value) pairs for the tags that are
+        set, as for :meth:`AVM.items`.
+        """
+        mask = self.mask
+        values = iter(self.values)
+        for name in FIELDS:
+            if mask & _BITS[name]:
+                yield name, next(values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __eq__(self, other):
+        if not isinstance(other, AVMRecord):
+            return NotImplemented
+        return (self.version, self.mask, self.values) == (other.version, other.mask, other.values)
+
+    def __repr__(self):
+        return f"<AVMRecord version={self.version} tags={len(self)}>"
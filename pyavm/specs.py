@@ -154,3 +154,14 @@ for spec in SPECS:
     for key in SPECS[spec]:
         value = SPECS[spec][key]
         REVERSE_SPECS[spec][value.namespace, value.tag] = key
+
+
+def validate_column(key, values, version=1.2):
+    """
+    Check many values of the tag ``key`` at once, for example a column of a
+    table. This returns the checked values and a list of booleans indicating
+    which values are invalid (see ``AVMData.validate_column``).
+    """
+    if key not in SPECS[version]:
+        raise ValueError(f"{key} is not a valid AVM tag in the {version} standard")
+    return SPECS[version][key].validate_column(values)
@@ -1,8 +1,12 @@
+import glob
 import os
+import warnings
+import xml.etree.ElementTree as et
 
 import pytest
 
-from ..avm import AVM
+from ..avm import AVM, AVMContainer, convert_version, parse_avm_content
+from ..exceptions import AVMItemNotInControlledVocabularyError
 
 ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 
@@ -17,6 +21,18 @@ def test_from_image_png():
     assert avm.ID == "eso1723a"
 
 
+def test_from_image_jpg_header_only(tmpdir):
+    # Only the header of the JPEG file should be read when extracting the
+    # XMP packet, so truncating the compressed image data should not matter
+    with open(os.path.join(ROOT, "eso_eso1723a_320.jpg"), "rb") as f:
+        content = f.read()
+    filename = tmpdir.join("truncated.jpg").strpath
+    with open(filename, "wb") as f:
+        f.write(content[: content.index(b"\xff\xda") + 10])
+    avm = AVM.from_image(filename)
+    assert avm.ID == "eso1723a"
+
+
 def test_from_image_other(tmpdir):
     # Here we test the brute-force search
     with open(os.path.join(ROOT, "3c321.avm.xml"), "rb") as f:
@@ -30,6 +46,11 @@ def test_from_image_other(tmpdir):
     assert avm.Publisher == "Chandra X-ray Observatory"
 
 
+def test_to_xmp_padding():
+    avm = AVM.from_xml_file(os.path.join(ROOT, "heic0515a.xml"))
+    assert len(avm.to_xmp(padding=2048)) == len(avm.to_xmp()) + 2048
+
+
 def test_from_wcs_cd():
     pytest.importorskip("astropy")
     pytest.importorskip("numpy")
@@ -62,6 +83,20 @@ def test_controlled_vocabulary_dash_placeholder():
     assert avm.Spectral.Band == ["Optical", "-", "Infrared"]
 
 
+def test_controlled_vocabulary_case():
+    avm = AVM()
+    avm.Type = "observation"
+    assert avm.Type == "Observation"
+    avm.Type = "oBSERVATION"
+    assert avm.Type == "Observation"
+    avm.Spatial.CoordinateFrame = "icrs"
+    assert avm.Spatial.CoordinateFrame == "ICRS"
+    avm.Spectral.ColorAssignment = ["BLUE", "gReen", " - "]
+    assert avm.Spectral.ColorAssignment == ["Blue", "Green", "-"]
+    with pytest.raises(AVMItemNotInControlledVocabularyError):
+        avm.Type = "Observations"
+
+
 def test_from_wcs_sip():
     """Test that WCS with SIP distortion extensions are handled correctly.
 
@@ -130,3 +165,401 @@ def test_avm_iteration():
     tag_names = [name for name, value in items]
     assert "Title" in tag_names
     assert "Spatial.Equinox" in tag_names
+
+
+def test_has_group():
+    avm = AVM()
+    assert len(avm) == 1
+    assert not avm.has_group("Spatial")
+    assert not avm.has_group("Distance")
+
+    avm.Spatial.Equinox = "J2000"
+    avm.Spatial.Rotation = 10.0
+    avm.Distance.Notes = "Notes"
+    avm.Title = "Title"
+    assert avm.has_group("Spatial")
+    assert avm.has_group("Distance")
+    assert len(avm) == len(list(avm.items())) == 5
+
+    avm.Spatial.Equinox = None
+    avm.Distance.Notes = None
+    avm.Title = None
+    assert avm.has_group("Spatial")
+    assert len(avm) == 2
+
+    avm.Spatial.Rotation = None
+    assert not avm.has_group("Spatial")
+    assert not avm.has_group("Distance")
+    assert len(avm) == 1
+
+    with pytest.raises(ValueError, match="Title is not an AVM group in the 1.2 standard"):
+        avm.has_group("Title")
+
+
+@pytest.mark.parametrize("options", [{}, {"lazy": True}, {"validate": False}])
+def test_len_from_image(options):
+    avm = AVM.from_image(os.path.join(ROOT, "eso_eso1723a_320.jpg"), **options)
+    assert avm.has_group("Spatial")
+    assert len(avm) == len(list(avm.items()))
+
+
+def test_len_lazy_empty():
+    # Values which are converted to None should not be counted as set when
+    # reading lazily
+    xml = PARSE_XML.replace('avm:ID="abc"', 'avm:ID=""')
+    xml = xml.replace("<avm:Type>Observation</avm:Type>", "<avm:Type></avm:Type>")
+    xml = xml.replace(
+        "</rdf:Description>",
+        "<avm:Creator><rdf:Seq><rdf:li/></rdf:Seq></avm:Creator>"
+        "<avm:Spatial.Notes></avm:Spatial.Notes></rdf:Description>",
+    )
+    full = AVM.from_xml(xml.encode())
+    avm = AVM.from_xml(xml.encode(), lazy=True)
+    assert len(avm) == len(full) == len(list(full.items())) == 2
+    assert avm.has_group("Spatial") == full.has_group("Spatial")
+    assert list(avm.items()) == list(full.items())
+
+
+@pytest.mark.parametrize("filename", ["heic0515a.xml", "sig05-021.xml", "3c321.avm.xml"])
+def test_len_lazy(filename):
+    with open(os.path.join(ROOT, filename), "rb") as f:
+        xml = f.read()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        full = AVM.from_xml(xml)
+        avm = AVM.from_xml(xml, lazy=True)
+        assert len(avm) == len(full)
+        for name in ("Spatial", "Spectral", "Contact", "FL", "Distance"):
+            assert avm.has_group(name) == full.has_group(name)
+
+
+PARSE_XML = """
+<x:xmpmeta xmlns:x="adobe:ns:meta/">
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:avm="http://www.communicatingastronomy.org/avm/1.0/"
+         xmlns:other="urn:other">
+<rdf:Description avm:Creator="Someone" other:Attribute="x" unqualified="y">
+  <other:Element><avm:Title>Ignored</avm:Title></other:Element>
+  <avm:Spectral.Band><rdf:Seq><rdf:li>Optical</rdf:li><rdf:li/></rdf:Seq></avm:Spectral.Band>
+  <avm:Publisher rdf:parseType="Resource" avm:ID="abc">
+    <avm:Type>Observation</avm:Type>
+    <avm:Title>Title</avm:Title>
+  </avm:Publisher>
+</rdf:Description>
+</rdf:RDF>
+</x:xmpmeta>
+"""
+
+
+def test_parse_avm_content():
+    content = parse_avm_content(et.fromstring(PARSE_XML))
+    assert list(content.items()) == [
+        (("avm", "Creator"), "Someone"),
+        (("avm", "Spectral.Band"), ["Optical", None]),
+        (("avm", "ID"), "abc"),
+        (("avm", "Type"), "Observation"),
+        (("avm", "Title"), "Title"),
+    ]
+
+
+def test_parse_avm_content_unexpected_tag():
+    # A property with a single child is only valid if the child is a list
+    xml = PARSE_XML.replace("<rdf:Seq>", "<avm:Distance>")
+    xml = xml.replace("<rdf:li>Optical</rdf:li><rdf:li/></rdf:Seq>", "</avm:Distance>")
+    with pytest.raises(ValueError, match="Unexpected tag .*/avm/1.0/:Distance"):
+        parse_avm_content(et.fromstring(xml))
+
+
+def test_parse_avm_content_keys():
+    keys = {("avm", "Creator"), ("avm", "Type")}
+    content = parse_avm_content(et.fromstring(PARSE_XML), keys=keys)
+    assert content == {("avm", "Creator"): "Someone", ("avm", "Type"): "Observation"}
+    assert keys == set()
+
+
+def test_from_image_tags():
+    filename = os.path.join(ROOT, "eso_eso1723a_320.jpg")
+    full = AVM.from_image(filename)
+    avm = AVM.from_image(filename, tags=["Title", "Spatial"])
+    assert avm.Title == full.Title
+    assert avm.Spatial.ReferenceValue == full.Spatial.ReferenceValue
+    assert avm.Description is None
+    assert avm.Spectral.Band is None
+    expected = {
+        name: value
+        for name, value in full.items()
+        if name == "Title" or name.startswith("Spatial.")
+    }
+    assert {name: value for name, value in avm.items() if name != "MetadataVersion"} == expected
+
+
+def test_from_image_single_tag():
+    avm = AVM.from_image(os.path.join(ROOT, "eso_eso1723a_320.jpg"), tags=["ID"])
+    assert avm.ID == "eso1723a"
+    assert avm.Title is None
+
+
+def test_from_xml_tags_version():
+    # The version should be read even if it is not requested
+    filename = os.path.join(ROOT, "heic0515a.xml")
+    full = AVM.from_xml_file(filename)
+    with open(filename, "rb") as f:
+        avm = AVM.from_xml(f.read(), tags=["Title"])
+    assert full.MetadataVersion == 1.1
+    assert avm.MetadataVersion == full.MetadataVersion
+    assert avm.Title == full.Title
+
+
+def test_from_xml_tags_invalid():
+    with pytest.raises(ValueError, match="Spectacular is not a valid AVM group or tag"):
+        AVM.from_xml(b"<rdf:RDF/>", tags=["Spectacular"])
+
+
+def test_from_image_lazy():
+    filename = os.path.join(ROOT, "eso_eso1723a_320.jpg")
+    full = AVM.from_image(filename)
+    avm = AVM.from_image(filename, lazy=True)
+    assert avm._items["Spatial"]._items["Equinox"].__class__.__name__ == "_Raw"
+    assert avm.Spatial.Equinox == full.Spatial.Equinox
+    assert avm._items["Spatial"]._items["Equinox"] == full.Spatial.Equinox
+    assert list(avm.items()) == list(full.items())
+    assert str(avm) == str(full)
+    assert AVM.from_image(filename, lazy=True).to_xml() == full.to_xml()
+
+
+def test_from_xml_lazy_invalid():
+    xml = PARSE_XML.replace('avm:Creator="Someone"', 'avm:Spatial.Scale="invalid"')
+    avm = AVM.from_xml(xml.encode(), lazy=True)
+    with pytest.raises(TypeError):
+        avm.Spatial.Scale
+
+
+def test_from_image_no_validation():
+    filename = os.path.join(ROOT, "eso_eso1723a_320.jpg")
+    full = AVM.from_image(filename)
+    avm = AVM.from_image(filename, validate=False)
+    assert avm.Spatial.Scale == [str(value) for value in full.Spatial.Scale]
+    avm.validate()
+    assert list(avm.items()) == list(full.items())
+
+
+@pytest.mark.parametrize(
+    "filename", sorted(glob.glob(os.path.join(ROOT, "*.xml"))), ids=os.path.basename
+)
+def test_to_xml_no_validation(filename):
+    # Values are validated when serialized, without changing the object
+    with open(filename, "rb") as f:
+        xml = f.read()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        avm = AVM.from_xml(xml, validate=False)
+        items = list(avm.items())
+        expected = AVM.from_xml(xml)
+        assert avm.to_xml() == expected.to_xml()
+        if expected.MetadataVersion == 1.1:
+            assert avm.to_xml() == _to_xml_elementtree(expected)
+    assert list(avm.items()) == items
+
+
+def test_to_xml_no_validation_invalid():
+    xml = PARSE_XML.replace('avm:Creator="Someone"', 'avm:Spatial.Scale="invalid"')
+    avm = AVM.from_xml(xml.encode(), validate=False)
+    with pytest.raises(TypeError):
+        avm.to_xml()
+
+
+def test_validate_invalid():
+    xml = PARSE_XML.replace('avm:Creator="Someone"', 'avm:Spatial.Scale="invalid"')
+    avm = AVM.from_xml(xml.encode(), validate=False)
+    assert avm.Spatial.Scale == "invalid"
+    with pytest.raises(TypeError):
+        avm.validate()
+
+
+def _to_xml_elementtree(avm):
+    # Serialize the AVM meta-data using the ElementTree-based to_xml methods
+    # of the datatypes, for comparison with AVM.to_xml
+    root = et.Element("{adobe:ns:meta/}xmpmeta")
+    trunk = et.SubElement(root, "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}RDF")
+    branch = et.SubElement(trunk, "{http://www.w3.org/1999/02/22-rdf-syntax-ns#}Description")
+    for name, value in avm.items():
+        # The values of groups (such as Distance) are not written by to_xml
+        if isinstance(avm._items.get(name), AVMContainer):
+            continue
+        avm._specs[name].to_xml(branch, value)
+    return et.tostring(root, encoding="utf-8", xml_declaration=False)
+
+
+def test_to_xml_matches_elementtree():
+    avm = AVM.from_image(os.path.join(ROOT, "eso_eso1723a_320.jpg"))
+    avm.Title = "Escaped & < > \" ' é"
+    avm.Subject.Name = ["", "x&y"]
+    avm.Spatial.ReferenceValue = [None, 1.5]
+    avm.Spectral.ColorAssignment = ["-", "-"]
+    assert avm.to_xml() == _to_xml_elementtree(avm)
+
+
+def test_to_xml_cache():
+    avm = AVM()
+    avm.Title = "First"
+    xml = avm.to_xml()
+    assert avm.to_xml() is xml
+
+    avm.Title = "Second"
+    assert b"Second" in avm.to_xml()
+
+    avm.Spatial.Notes = "Some notes"
+    assert b"Some notes" in avm.to_xml()
+
+    avm.Distance = [1.0]
+    xml = avm.to_xml()
+    avm.Distance.Notes = "Distance notes"
+    assert avm.to_xml() is not xml
+
+    xml = avm.to_xml()
+    avm.MetadataVersion = 1.1
+    assert avm.to_xml() is not xml
+
+
+def test_to_xml_cache_lists_in_place():
+    avm = AVM()
+    avm.Subject.Category = ["A.1"]
+    avm.Spatial.ReferenceValue = [10.0, 20.0]
+    xml = avm.to_xml()
+    assert avm.to_xml() is xml
+
+    avm.Subject.Category.append("B.2")
+    assert b"B.2" in avm.to_xml()
+
+    avm.Spatial.ReferenceValue[0] = 30.0
+    assert b"30.0" in avm.to_xml()
+    assert avm.to_xml() == AVM.from_xml(avm.to_xml()).to_xml()
+    assert b"30.0" in avm.to_xmp()
+
+
+def test_to_xml_no_side_effects():
+    avm = AVM(version=1.2)
+    avm.ProposalID = ["25661"]
+    with pytest.warns(UserWarning, match="ProposalID is not defined in format specification 1.1"):
+        xml = avm.to_xml()
+    assert b"ProposalID" not in xml
+    assert b"<avm:MetadataVersion>1.1" in xml
+    assert avm.MetadataVersion == 1.2
+    assert avm.ProposalID == ["25661"]
+
+
+def _layout(avm):
+    # Return the tags and groups of an AVM object in a form that can be
+    # compared between objects
+    return [
+        (name, item._name, item._items, getattr(item, "value", "no value"))
+        if isinstance(item, AVMContainer)
+        else (name, item)
+        for name, item in avm._items.items()
+    ]
+
+
+@pytest.mark.parametrize("version", [1.0, 1.1, 1.2])
+def test_init_schema(version):
+    # Check that the layout created from the schema matches the one created
+    # by _update_attributes
+    avm = AVM(version=version)
+    reference = object.__new__(AVM)
+    object.__setattr__(reference, "_items", {"MetadataVersion": version})
+    reference._update_attributes()
+    assert _layout(avm) == _layout(reference)
+    assert all(
+        item._parent is avm for item in avm._items.values() if isinstance(item, AVMContainer)
+    )
+
+    # Groups should not be shared between instances
+    other = AVM(version=version)
+    other.Spatial.Notes = "Notes"
+    assert avm.Spatial.Notes is None
+
+
+def test_generated_classes():
+    avm = AVM(version=1.1)
+    assert isinstance(avm, AVM)
+    assert not hasattr(avm, "__dict__")
+    assert not hasattr(avm.Spatial, "__dict__")
+    assert type(avm) is AVM._classes(1.1)[0]
+    assert type(avm.Spatial) is AVM._classes(1.1)[1]["Spatial"]
+
+    avm.Spatial.Equinox = "J2000"
+    assert avm.Spatial.Equinox == "J2000"
+    with pytest.raises(TypeError):
+        avm.Spatial.ReferencePixel = "hello world"
+    with pytest.raises(AttributeError, match="Equinx is not a valid AVM tag"):
+        avm.Spatial.Equinx = "J2000"
+    with pytest.raises(AttributeError, match="Tittle is not a valid AVM group or tag in the 1.1"):
+        avm.Tittle = "Title"
+    with pytest.raises(AttributeError, match="Spatial is an AVM group, not a tag"):
+        avm.Spatial = "test"
+
+    avm.MetadataVersion = 1.2
+    assert type(avm) is AVM._classes(1.2)[0]
+    assert type(avm.Spatial) is AVM._classes(1.2)[1]["Spatial"]
+    assert avm.Spatial.Equinox == "J2000"
+    avm.ProposalID = ["25661"]
+    assert avm.ProposalID == ["25661"]
+
+    class CustomAVM(AVM):
+        pass
+
+    avm = CustomAVM.from_xml(avm.to_xml())
+    assert isinstance(avm, CustomAVM)
+    assert type(avm) is CustomAVM._classes(1.1)[0]
+    assert type(avm)._classes(1.2) == CustomAVM._classes(1.2)
+    with pytest.raises(AttributeError, match="ProposalID is not a valid AVM group or tag"):
+        avm.ProposalID = ["25661"]
+
+    # Objects read from XML keep the tags from later versions, which are not
+    # validated, as for the original classes
+    xml = PARSE_XML.replace('avm:Creator="Someone"', 'avm:MetadataVersion="1.0"')
+    avm = AVM.from_xml(xml.encode())
+    assert type(avm) is AVM._classes(1.0)[0]
+    avm.Spatial.FITSheader = 1
+    assert avm.Spatial.FITSheader == 1
+    with pytest.raises(AttributeError, match="Title is not a valid AVM group or tag in the 1.0"):
+        avm.Title = "Title"
+
+
+def _reconcile(avm, version):
+    # Change the version using the full reconciliation of _update_attributes
+    avm._items["MetadataVersion"] = version
+    avm._update_attributes()
+
+
+@pytest.mark.parametrize("source", [1.0, 1.1, 1.2])
+@pytest.mark.parametrize("target", [1.0, 1.1, 1.2])
+def test_metadata_version_diff(source, target):
+    avms = []
+    for _ in range(2):
+        avm = AVM(version=source)
+        avm.Creator = "Someone"
+        if source > 1.0:
+            avm.Title = "Title"
+            avm.Distance.Notes = "Notes"
+        if source > 1.1:
+            avm.ProposalID = ["25661"]
+        avms.append(avm)
+
+    with warnings.catch_warnings(record=True) as expected:
+        warnings.simplefilter("always")
+        _reconcile(avms[0], target)
+        _reconcile(avms[0], 1.2)
+
+    with warnings.catch_warnings(record=True) as actual:
+        warnings.simplefilter("always")
+        convert_version([avms[1]], target)
+        avms[1].MetadataVersion = 1.2
+
+    assert _layout(avms[1]) == _layout(avms[0])
+    assert len(avms[1]) == len(avms[0]) == len(list(avms[1].items()))
+    assert [str(w.message) for w in actual] == [str(w.message) for w in expected]
+
+
+def test_convert_version_invalid():
+    with pytest.raises(ValueError, match="Unknown AVM version: 2.0"):
+        convert_version([AVM()], 2.0)
@@ -0,0 +1,50 @@
+from io import BytesIO
+
+import pytest
+
+from ..exceptions import NoXMPPacketFound
+from ..extract import _scan_xmp, extract_xmp
+
+
+def packet(title):
+    return (
+        b'<?xpacket begin="\xef\xbb\xbf" id="W5M0MpCehiHzreSzNTczkc9d"?>\n'
+        b'<x:xmpmeta xmlns:x="adobe:ns:meta/">' + title + b"</x:xmpmeta>"
+    )
+
+
+CONTENTS = b"\x00" * 1000 + packet(b"first") + b"\x01" * 500 + packet(b"second") + b"\x00" * 10
+
+
+@pytest.mark.parametrize("block_size", [1, 7, 16, 1024, 1 << 20])
+def test_scan(block_size):
+    fileobj = BytesIO(CONTENTS)
+    with pytest.warns(UserWarning, match="Multiple XMP packets"):
+        assert _scan_xmp(fileobj, None, block_size=block_size) == packet(b"first")
+    fileobj.seek(0)
+    assert _scan_xmp(fileobj, 1, block_size=block_size) == packet(b"second")
+    fileobj.seek(0)
+    with pytest.raises(IndexError, match="only 2 packets are present"):
+        _scan_xmp(fileobj, 2, block_size=block_size)
+
+
+def test_scan_stops_early():
+    # Data after the requested packet is never read
+    class Truncated(BytesIO):
+        def read(self, size=-1):
+            if self.tell() > len(CONTENTS) - 100:
+                raise AssertionError("read past requested packet")
+            return super().read(size)
+
+    assert _scan_xmp(Truncated(CONTENTS), 0, block_size=64) == packet(b"first")
+
+
+def test_scan_no_packet():
+    with pytest.warns(UserWarning, match="scanning file contents"):
+        with pytest.raises(NoXMPPacketFound):
+            extract_xmp(b"\x00" * 1000)
+
+
+def test_scan_unterminated():
+    with pytest.raises(ValueError, match="end of the XMP packet"):
+        _scan_xmp(BytesIO(packet(b"first")[:-5]), 0, block_size=16)
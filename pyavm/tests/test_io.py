@@ -1,6 +1,7 @@
 import glob
 import os
 import warnings
+from io import BytesIO
 
 import pytest
 
@@ -8,14 +9,23 @@ pytest.importorskip("PIL")
 pytest.importorskip("numpy")
 
 import numpy as np
-from PIL import Image
+from PIL import Image, features
 
 from .. import AVM
+from ..embed import embed_xmp, update_xmp
 
 ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
 
 XML_FILES = glob.glob(os.path.join(ROOT, "*.xml"))
 
+EXTENSIONS = [
+    "jpg",
+    "png",
+    "tif",
+    pytest.param("webp", marks=pytest.mark.skipif(not features.check("webp"), reason="no WebP")),
+    pytest.param("avif", marks=pytest.mark.skipif(not features.check("avif"), reason="no AVIF")),
+]
+
 
 @pytest.mark.parametrize("xml_file", XML_FILES)
 def test_io_png(tmpdir, xml_file):
@@ -73,3 +83,159 @@ def test_io_jpeg_repeat(tmpdir, xml_file):
         avm.embed(filename_out_1, filename_out_2, verify=True)
         messages = [str(x.message) for x in w]
         assert "Discarding existing XMP packet from JPEG file" in messages
+
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_embed_overwrite(tmpdir, extension):
+    avm = AVM.from_xml_file(os.path.join(ROOT, "heic0515a.xml"))
+    filename = tmpdir.join(f"test.{extension}").strpath
+    i = Image.fromarray(np.ones((16, 16), dtype=np.uint8))
+    i.save(filename)
+    avm.embed(filename, filename, verify=True)
+    assert AVM.from_image(filename).ID == "heic0515a"
+
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_update_in_place(tmpdir, extension):
+    avm = AVM.from_xml_file(os.path.join(ROOT, "heic0515a.xml"))
+    filename = tmpdir.join(f"test.{extension}").strpath
+    i = Image.fromarray(np.ones((16, 16), dtype=np.uint8))
+    i.save(filename)
+
+    # There is no existing packet, so the file has to be rewritten
+    assert not avm.update_in_place(filename, padding=1000)
+
+    with open(filename, "rb") as f:
+        before = f.read()
+
+    # The packet now has enough padding for a slightly longer title
+    avm.Title = "A longer title for the Crab Nebula"
+    assert avm.update_in_place(filename)
+
+    with open(filename, "rb") as f:
+        after = f.read()
+
+    assert len(after) == len(before)
+    assert AVM.from_image(filename).Title == "A longer title for the Crab Nebula"
+    Image.open(filename).verify()
+
+    # The packet no longer fits, so the file has to be rewritten
+    avm.Description = "x" * 2000
+    assert not avm.update_in_place(filename)
+    assert AVM.from_image(filename).Description == "x" * 2000
+    Image.open(filename).verify()
+
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_embed_padding(tmpdir, extension):
+    avm = AVM.from_xml_file(os.path.join(ROOT, "heic0515a.xml"))
+    filename_in = tmpdir.join(f"test_in.{extension}").strpath
+    filename_out = tmpdir.join(f"test_out.{extension}").strpath
+    i = Image.fromarray(np.ones((16, 16), dtype=np.uint8))
+    i.save(filename_in)
+    avm.embed(filename_in, filename_out, padding=1000)
+
+    avm.Title = "A longer title for the Crab Nebula"
+    assert avm.update_in_place(filename_out)
+    assert AVM.from_image(filename_out).Title == "A longer title for the Crab Nebula"
+
+
+def test_embed_png_compressed(tmpdir):
+    avm = AVM.from_xml_file(os.path.join(ROOT, "heic0515a.xml"))
+    filename_in = tmpdir.join("test_in.png").strpath
+    filename_out = tmpdir.join("test_out.png").strpath
+    i = Image.fromarray(np.ones((16, 16), dtype=np.uint8))
+    i.save(filename_in)
+    avm.embed(filename_in, filename_out, verify=True, compression_threshold=1024)
+    assert os.path.getsize(filename_out) < os.path.getsize(filename_in) + len(avm.to_xmp()) / 2
+    assert AVM.from_image(filename_out).ID == "heic0515a"
+    # Compressed packets can't be updated in place
+    assert not avm.update_in_place(filename_out)
+    assert AVM.from_image(filename_out).ID == "heic0515a"
+
+
+def test_embed_jpeg_extended_xmp(tmpdir):
+    avm = AVM.from_xml_file(os.path.join(ROOT, "heic0515a.xml"))
+    avm.Description = "".join(f"{i:08d}" for i in range(20000))
+    filename_in = tmpdir.join("test_in.jpg").strpath
+    filename_out = tmpdir.join("test_out.jpg").strpath
+    i = Image.fromarray(np.ones((16, 16), dtype=np.uint8))
+    i.save(filename_in)
+    avm.embed(filename_in, filename_out, verify=True)
+
+    # The packet is split into a standard packet and several extension segments
+    with open(filename_out, "rb") as f:
+        contents = f.read()
+    assert contents.count(b"http://ns.adobe.com/xmp/extension/\x00") == 3
+
+    avm_new = AVM.from_image(filename_out)
+    assert avm_new.ID == "heic0515a"
+    assert avm_new.Description == avm.Description
+
+    # Packets with extended XMP are always rewritten
+    avm.Description = "short"
+    assert not avm.update_in_place(filename_out)
+    assert AVM.from_image(filename_out).Description == "short"
+    with open(filename_out, "rb") as f:
+        assert b"http://ns.adobe.com/xmp/extension/" not in f.read()
+
+
+@pytest.mark.parametrize("extension", EXTENSIONS)
+def test_io_in_memory(tmpdir, extension):
+    avm = AVM.from_xml_file(os.path.join(ROOT, "heic0515a.xml"))
+    filename_in = tmpdir.join(f"test_in.{extension}").strpath
+    i = Image.fromarray(np.ones((16, 16), dtype=np.uint8))
+    i.save(filename_in)
+    with open(filename_in, "rb") as f:
+        contents_in = f.read()
+
+    # Bytes in, bytes out
+    contents = avm.embed(contents_in, None, verify=True)
+    assert isinstance(contents, bytes)
+    assert AVM.from_image(contents).ID == "heic0515a"
+    assert AVM.from_image(memoryview(contents)).ID == "heic0515a"
+    assert AVM.from_image(BytesIO(contents)).ID == "heic0515a"
+
+    # File objects in and out
+    output = BytesIO()
+    assert avm.embed(BytesIO(contents_in), output, verify=True) is None
+    assert output.getvalue() == contents
+
+    # Filename in, file object out
+    filename_out = tmpdir.join(f"test_out.{extension}").strpath
+    with open(filename_out, "wb") as f:
+        avm.embed(filename_in, f)
+    with open(filename_out, "rb") as f:
+        assert f.read() == contents
+        assert AVM.from_image(f).ID == "heic0515a"
+
+
+def test_update_in_place_file_object(tmpdir):
+    avm = AVM.from_xml_file(os.path.join(ROOT, "heic0515a.xml"))
+    i = Image.fromarray(np.ones((16, 16), dtype=np.uint8))
+    image = BytesIO()
+    i.save(image, format="png")
+    image = BytesIO(embed_xmp(image.getvalue(), None, avm.to_xmp(padding=1000)))
+    avm.Title = "A longer title for the Crab Nebula"
+    assert update_xmp(image, avm.to_xmp())
+    assert AVM.from_image(image).Title == "A longer title for the Crab Nebula"
+
+
+def test_jpeg_bytes_between_segments(tmpdir):
+    # Bytes that are not part of any segment are skipped, as by libjpeg
+    with open(os.path.join(ROOT, "eso_eso1723a_320.jpg"), "rb") as f:
+        contents = f.read()
+    assert contents[2:4] == b"\xff\xe0"
+    end = 4 + int.from_bytes(contents[4:6], "big")
+    filename_in = tmpdir.join("test_in.jpg").strpath
+    with open(filename_in, "wb") as f:
+        f.write(contents[:end] + b"\x00\x00" + contents[end:])
+
+    avm = AVM.from_image(filename_in)
+    assert avm.to_xml() == AVM.from_image(os.path.join(ROOT, "eso_eso1723a_320.jpg")).to_xml()
+
+    filename_out = tmpdir.join("test_out.jpg").strpath
+    avm.Title = "New title"
+    avm.embed(filename_in, filename_out)
+    assert AVM.from_image(filename_out).Title == "New title"
+    assert Image.open(filename_out).size == Image.open(filename_in).size
@@ -0,0 +1,45 @@
+from io import BytesIO
+
+import pytest
+
+from ..io_utils import copy_range, write_buffers
+
+DATA = bytes(range(256)) * 1000
+
+
+@pytest.mark.parametrize("to_file", [False, True])
+@pytest.mark.parametrize("from_file", [False, True])
+def test_copy_range(tmpdir, from_file, to_file):
+    filename_in = tmpdir.join("in").strpath
+    filename_out = tmpdir.join("out").strpath
+    with open(filename_in, "wb") as f:
+        f.write(DATA)
+    fileobj_in = open(filename_in, "rb") if from_file else BytesIO(DATA)
+    fileobj_out = open(filename_out, "wb") if to_file else BytesIO()
+    with fileobj_in, fileobj_out:
+        fileobj_out.write(b"header")
+        copy_range(fileobj_in, fileobj_out, 1000, 100000, buffer_size=4096)
+        copy_range(fileobj_in, fileobj_out, 250000)
+        fileobj_out.write(b"footer")
+        if not to_file:
+            result = fileobj_out.getvalue()
+    if to_file:
+        with open(filename_out, "rb") as f:
+            result = f.read()
+    assert result == b"header" + DATA[1000:101000] + DATA[250000:] + b"footer"
+
+
+@pytest.mark.parametrize("to_file", [False, True])
+def test_write_buffers(tmpdir, to_file):
+    filename_out = tmpdir.join("out").strpath
+    buffers = [b"a", b"", memoryview(b"bcd"), bytearray(b"e")] * 1000
+    fileobj_out = open(filename_out, "wb") if to_file else BytesIO()
+    with fileobj_out:
+        fileobj_out.write(b"header")
+        write_buffers(fileobj_out, buffers)
+        if not to_file:
+            result = fileobj_out.getvalue()
+    if to_file:
+        with open(filename_out, "rb") as f:
+            result = f.read()
+    assert result == b"header" + b"abcde" * 1000
@@ -0,0 +1,101 @@
+from io import BytesIO
+
+import pytest
+
+from ..embed import embed_xmp, update_xmp
+from ..exceptions import NoXMPPacketFound
+from ..extract import extract_xmp
+from ..formats import sniff_format
+from ..isobmff import (
+    JXL_SIGNATURE,
+    XMP_UUID,
+    ItemLocation,
+    box,
+    iter_boxes,
+    pack_iloc,
+    read_iloc,
+)
+
+PACKET = (
+    b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?><x:xmpmeta></x:xmpmeta><?xpacket end="w"?>'
+)
+
+CODESTREAM = b"\xff\x0a" + bytes(range(256)) * 4
+
+
+def box_types(contents):
+    return [b[3] for b in iter_boxes(BytesIO(contents), 0, len(contents))]
+
+
+def test_jxl_codestream():
+    with pytest.raises(NoXMPPacketFound):
+        extract_xmp(CODESTREAM)
+
+    # Bare codestreams are wrapped in a container
+    tagged = embed_xmp(CODESTREAM, None, PACKET)
+    assert tagged.startswith(JXL_SIGNATURE)
+    assert box_types(tagged) == [b"JXL ", b"ftyp", b"jxlc", b"xml "]
+    assert CODESTREAM in tagged
+    assert extract_xmp(tagged) == PACKET
+
+    # Existing packets are replaced
+    with pytest.warns(UserWarning, match="Discarding existing XMP packet"):
+        retagged = embed_xmp(tagged, None, PACKET.replace(b"x:xmpmeta>", b"x:xmpmeta >"))
+    assert box_types(retagged) == [b"JXL ", b"ftyp", b"jxlc", b"xml "]
+    assert extract_xmp(retagged) == PACKET.replace(b"x:xmpmeta>", b"x:xmpmeta >")
+
+    fileobj = BytesIO(retagged)
+    assert update_xmp(fileobj, PACKET)
+    assert extract_xmp(fileobj) == PACKET.replace(b"<?xpacket end", b"  <?xpacket end")
+
+
+def test_jxl_box_to_end_of_file():
+    # The last box can have a size of zero, meaning that it extends to the
+    # end of the file
+    contents = JXL_SIGNATURE + box(b"ftyp", b"jxl \x00\x00\x00\x00jxl ")
+    contents += b"\x00\x00\x00\x00jxlc" + CODESTREAM
+    tagged = embed_xmp(contents, None, PACKET)
+    assert box_types(tagged) == [b"JXL ", b"ftyp", b"jxlc", b"xml "]
+    assert extract_xmp(tagged) == PACKET
+
+
+def test_uuid():
+    contents = box(b"ftyp", b"jp2 \x00\x00\x00\x00jp2 ") + box(b"uuid", XMP_UUID + PACKET)
+    assert extract_xmp(contents) == PACKET
+
+
+@pytest.mark.parametrize(
+    "ftyp, expected",
+    [
+        (b"heic\x00\x00\x00\x00mif1heic", "isobmff"),
+        (b"isom\x00\x00\x02\x00isomavif", "isobmff"),
+        (b"qt  \x00\x00\x00\x00qt  ", None),
+        (b"mp42\x00\x00\x00\x00mp42isom", None),
+    ],
+)
+def test_sniff_brands(ftyp, expected):
+    assert sniff_format(BytesIO(box(b"ftyp", ftyp))) == expected
+
+
+def test_movie_udta():
+    # XMP packets in QuickTime movies are found by scanning the file
+    contents = box(b"ftyp", b"qt  \x00\x00\x00\x00qt  ")
+    contents += box(b"moov", box(b"udta", box(b"XMP_", PACKET)))
+    with pytest.warns(UserWarning, match="scanning file contents"):
+        xmp = extract_xmp(contents)
+    assert xmp == PACKET[: PACKET.index(b"</x:xmpmeta>") + 12]
+
+
+@pytest.mark.parametrize("version", [0, 1, 2])
+def test_iloc_roundtrip(version):
+    locations = [
+        ItemLocation(1, 0, 0, 0, [(0, 100, 200), (0, 400, 10)]),
+        ItemLocation(2, 0, 0, 2**33, [(0, 0, 50)]),
+    ]
+    if version > 0:
+        locations.append(ItemLocation(3, 1, 0, 0, [(0, 5, 5)]))
+    read_version, read_locations = read_iloc(pack_iloc(version, locations))
+    assert read_version == version
+    assert [vars(location) for location in read_locations] == [
+        vars(location) for location in locations
+    ]
@@ -0,0 +1,133 @@
+import os
+import struct
+from io import BytesIO
+
+import pytest
+
+from ..jpeg import (
+    JPEGFile,
+    JPEGSegment,
+    extended_xmp_segments,
+    read_extended_xmp,
+    read_header_segments,
+    xmp_segment,
+)
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def segment(marker, payload):
+    return b"\xff" + marker + struct.pack(">H", len(payload) + 2) + payload
+
+
+def make_jpeg():
+    # Entropy-coded data with stuffed bytes and restart markers
+    scan = b"\x12\xff\x00\x34\xff\xd0\x56\xff\x00\xff\xd1\x78"
+    return (
+        b"\xff\xd8"
+        + segment(b"\xe1", b"http://ns.adobe.com/xap/1.0/\x00<x>\xff\xd9</x>")
+        + segment(b"\xeb", b"JP\x00\x00")
+        + segment(b"\xc1", b"\x08\x00\x10\x00\x10\x01\x01\x11\x00")
+        + segment(b"\xda", b"\x01\x01\x00\x00\x3f\x00")
+        + scan
+        + segment(b"\xc4", b"\x00" * 17)
+        + segment(b"\xda", b"\x01\x01\x00\x00\x3f\x00")
+        + scan
+        + b"\xff\xd9"
+    )
+
+
+def test_segments():
+    contents = make_jpeg()
+    jpeg_file = JPEGFile.from_bytes(contents)
+    assert [s.type for s in jpeg_file.segments] == [
+        "SOI",
+        "APP1",
+        "APP11",
+        "SOF1",
+        "SOS",
+        "DHT",
+        "SOS",
+        "EOI",
+    ]
+    assert jpeg_file.segments[1].is_xmp
+    assert b"".join(s.bytes for s in jpeg_file.segments) == contents
+
+
+def test_trailing_data():
+    contents = make_jpeg() + b"trailing"
+    jpeg_file = JPEGFile.from_bytes(contents)
+    assert jpeg_file.segments[-1].bytes == b"\xff\xd9trailing"
+
+
+def test_missing_eoi():
+    with pytest.raises(ValueError, match="did not end with EOI"):
+        JPEGFile.from_bytes(make_jpeg()[:-2])
+
+
+def test_truncated_segment():
+    with pytest.raises(ValueError, match="Unexpected end of file"):
+        JPEGFile.from_bytes(make_jpeg()[:20])
+
+
+@pytest.mark.parametrize("length", [b"\x00\x00", b"\x00\x01"])
+def test_invalid_segment_length(length):
+    contents = b"\xff\xd8\xff\xe1" + length + make_jpeg()[2:]
+    with pytest.raises(ValueError, match="Invalid JPEG segment length"):
+        read_header_segments(BytesIO(contents))
+    with pytest.raises(ValueError, match="Invalid JPEG segment length"):
+        JPEGFile.from_bytes(contents)
+
+
+def test_truncated_header_segment():
+    with pytest.raises(ValueError, match="Unexpected end of file while reading JPEG segment"):
+        read_header_segments(BytesIO(make_jpeg()[:20]))
+
+
+def test_roundtrip():
+    filename = os.path.join(ROOT, "eso_eso1723a_320.jpg")
+    with open(filename, "rb") as f:
+        contents = f.read()
+    jpeg_file = JPEGFile.read(filename)
+    assert b"".join(s.bytes for s in jpeg_file.segments) == contents
+
+
+def test_extended_xmp():
+    extended_xmp = bytes(range(256)) * 1000
+    guid = b"0123456789ABCDEF0123456789ABCDEF"
+    segments = extended_xmp_segments(extended_xmp, guid)
+    assert len(segments) == 4
+    assert all(s.is_extended_xmp and not s.is_xmp for s in segments)
+    parsed = [JPEGSegment.from_bytes(s.bytes) for s in reversed(segments)]
+    assert read_extended_xmp(parsed, guid) == extended_xmp
+    assert read_extended_xmp(parsed, b"F" * 32) is None
+
+
+def test_extended_xmp_other_guid():
+    # Only the segments with the requested GUID are reassembled, so others
+    # are not checked and their declared lengths are not allocated
+    guid = b"0" * 32
+    segments = extended_xmp_segments(b"a" * 100, guid)
+    segments += extended_xmp_segments(b"b" * 100, b"1" * 32)
+    segments[-1].bytes = segments[-1].bytes[:71] + struct.pack(">II", 0x7FFFFFFF, 0) + b"b"
+    assert read_extended_xmp(segments, guid) == b"a" * 100
+
+
+def test_extended_xmp_inconsistent():
+    segments = extended_xmp_segments(b"a" * 70000, b"0" * 32)
+    segments += extended_xmp_segments(b"b" * 100, b"0" * 32)
+    with pytest.raises(ValueError, match="inconsistent lengths"):
+        read_extended_xmp(segments, b"0" * 32)
+
+
+def test_extended_xmp_incomplete():
+    guid = b"0" * 32
+    segment = extended_xmp_segments(b"a" * 100, guid)[0]
+    segment.bytes = segment.bytes[:71] + struct.pack(">II", 0x7FFFFFFF, 0) + b"a" * 100
+    with pytest.raises(ValueError, match="incomplete"):
+        read_extended_xmp([segment], guid)
+
+
+def test_xmp_segment_too_long():
+    with pytest.raises(ValueError, match="too long"):
+        xmp_segment(b"x" * 65503)
@@ -0,0 +1,88 @@
+import os
+import struct
+
+import pytest
+
+from ..extract import extract_xmp
+from ..png import PNGChunk, PNGFile, itxt_chunk, itxt_text, parse_itxt
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def test_from_memoryview(tmpdir):
+    filename = os.path.join(ROOT, "eso_eso1723a_320.png")
+    filename_out = tmpdir.join("test.png").strpath
+    with open(filename, "rb") as f:
+        png_file = PNGFile.from_bytes(memoryview(f.read()))
+    assert all(isinstance(c.data, memoryview) for c in png_file.chunks)
+    png_file.write(filename_out)
+    with open(filename, "rb") as f1, open(filename_out, "rb") as f2:
+        assert f1.read() == f2.read()
+
+
+def corrupt_idat(tmpdir):
+    with open(os.path.join(ROOT, "eso_eso1723a_320.png"), "rb") as f:
+        contents = bytearray(f.read())
+    # Flip a bit in the CRC of the first IDAT chunk
+    start = contents.index(b"IDAT") - 4
+    (length,) = struct.unpack_from(">I", contents, start)
+    contents[start + 8 + length] ^= 1
+    filename = tmpdir.join("corrupt.png").strpath
+    with open(filename, "wb") as f:
+        f.write(contents)
+    return filename, bytes(contents)
+
+
+@pytest.mark.parametrize("from_bytes", [False, True])
+def test_verify(tmpdir, from_bytes):
+    filename, contents = corrupt_idat(tmpdir)
+
+    if from_bytes:
+
+        def read(filename, **kwargs):
+            with open(filename, "rb") as f:
+                return PNGFile.from_bytes(memoryview(f.read()), **kwargs)
+
+    else:
+        read = PNGFile.read
+
+    with pytest.raises(ValueError, match="does not match advertised"):
+        read(filename)
+
+    with pytest.raises(ValueError, match="verify should be one of"):
+        read(filename, verify="some")
+
+    for verify in ["metadata", "none"]:
+        filename_out = tmpdir.join(f"{verify}.png").strpath
+        read(filename, verify=verify).write(filename_out)
+        # The CRC of chunks that were not verified should be left unchanged
+        with open(filename_out, "rb") as f:
+            assert f.read() == contents
+
+
+def test_extract_skips_image_data(tmpdir):
+    filename, _ = corrupt_idat(tmpdir)
+    assert b"eso1723a" in extract_xmp(filename)
+
+
+def test_crc_cache():
+    chunk = PNGChunk()
+    chunk.type = b"tEXt"
+    chunk.data = b"a"
+    crc = chunk.crc
+    chunk.data += b"b"
+    assert chunk.crc != crc
+
+
+def test_itxt_roundtrip():
+    for compress in [False, True]:
+        chunk = itxt_chunk(b"XML:com.adobe.xmp", b"<x>" * 10000, compress=compress)
+        assert parse_itxt(chunk.data)[:2] == (b"XML:com.adobe.xmp", compress)
+        assert itxt_text(chunk.data, block_size=100) == b"<x>" * 10000
+    assert len(chunk.data) < 1000
+
+
+def test_itxt_language():
+    # Language tag and translated keyword are not always empty
+    data = b"XML:com.adobe.xmp\x00\x00\x00en\x00XMP\x00<x/>"
+    assert itxt_text(data) == b"<x/>"
@@ -0,0 +1,80 @@
+import glob
+import os
+import pickle
+import warnings
+
+import pytest
+
+from ..avm import AVM
+from ..record import AVMRecord
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+XML_FILES = sorted(glob.glob(os.path.join(ROOT, "*.xml")))
+
+
+@pytest.mark.parametrize("filename", XML_FILES, ids=os.path.basename)
+def test_round_trip(filename):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        avm = AVM.from_xml_file(filename)
+        record = AVMRecord.from_avm(avm)
+        result = record.to_avm()
+        assert type(result) is type(avm)
+        assert list(result.items()) == list(avm.items())
+        assert len(result) == len(avm) == len(record)
+        assert result.to_xml() == avm.to_xml()
+    assert AVMRecord.from_avm(result) == record
+    assert pickle.loads(pickle.dumps(record)) == record
+
+
+@pytest.mark.parametrize("options", [{"lazy": True}, {"validate": False}])
+def test_round_trip_options(options):
+    filename = os.path.join(ROOT, "eso_eso1723a_320.jpg")
+    avm = AVM.from_image(filename, **options)
+    record = AVMRecord.from_avm(avm)
+    assert list(record.to_avm().items()) == list(avm.items())
+    if not options.get("validate", True):
+        result = record.to_avm()
+        result.validate()
+        assert list(result.items()) == list(AVM.from_image(filename).items())
+
+
+def test_round_trip_version():
+    avm = AVM(version=1.2)
+    avm.Distance = ["10"]
+    avm.ProposalID = ["25661"]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        avm.MetadataVersion = 1.0
+    result = AVMRecord.from_avm(avm).to_avm()
+    assert result.MetadataVersion == 1.0
+    assert list(result.items()) == [("MetadataVersion", 1.0), ("Distance", [10.0])]
+    assert len(result) == 2
+    assert type(result) is type(avm)
+
+
+def test_access():
+    avm = AVM()
+    avm.Publisher = "Chandra X-ray Observatory"
+    avm.Spatial.Equinox = "J2000"
+    avm.Spectral.Band = ["Optical", "Infrared"]
+
+    record = AVMRecord.from_avm(avm)
+    assert record["Publisher"] == "Chandra X-ray Observatory"
+    assert record["Spatial.Equinox"] == "J2000"
+    assert record["Spectral.Band"] == ("Optical", "Infrared")
+    assert record["Title"] is None
+    assert dict(record.items()) == {
+        "MetadataVersion": 1.2,
+        "Publisher": "Chandra X-ray Observatory",
+        "Spatial.Equinox": "J2000",
+        "Spectral.Band": ("Optical", "Infrared"),
+    }
+    with pytest.raises(KeyError):
+        record["Spatial"]
+
+    # Strings are shared between records
+    other = AVM()
+    other.Publisher = "".join(["Chandra X-ray ", "Observatory"])
+    assert AVMRecord.from_avm(other)["Publisher"] is record["Publisher"]
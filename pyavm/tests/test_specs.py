@@ -5,6 +5,7 @@ import pytest
 warnings.filterwarnings("always")
 
 from ..avm import AVM, AVMContainer
+from ..specs import SPECS, validate_column
 
 
 @pytest.mark.parametrize("version", [1.1, 1.2])
@@ -99,14 +100,24 @@ def test_specs(version):
 
     x = a.to_xml()
 
+    # Serializing should not change the AVM object
+    assert a.MetadataVersion == version
+
     b = AVM.from_xml(x)
 
+    # The XML is written using version 1.1 of the standard
+    assert b.MetadataVersion == 1.1
+
     for key in a._items:
         if isinstance(a._items[key], AVMContainer):
             for subkey in a._items[key]._items:
                 assert a._items[key]._items[subkey] == b._items[key]._items[subkey]
-        else:
+        elif key == "MetadataVersion":
+            continue
+        elif key in SPECS[1.1]:
             assert a._items[key] == b._items[key]
+        else:
+            assert b._items[key] is None
 
 
 def test_warning():
@@ -127,3 +138,60 @@ def test_warning():
         a.ProposalID = ["44663"]
     except AttributeError as exc:
         assert exc.args[0] == "ProposalID is not a valid AVM group or tag in the 1.1 standard"
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_validate_column(use_numpy):
+    if use_numpy:
+        np = pytest.importorskip("numpy")
+        convert = np.array
+    else:
+        convert = list
+
+    values, errors = validate_column("Spatial.Rotation", convert(["1.5", "2", "x"]))
+    assert values == [1.5, 2.0, None]
+    assert errors == [False, False, True]
+
+    values, errors = validate_column("Spatial.Rotation", convert([1.5, 2.0]))
+    assert values == [1.5, 2.0]
+    assert errors == [False, False]
+
+    values, errors = validate_column(
+        "Spatial.ReferenceValue", [["1", "2"], ["3", "4"], ["-", "5"], ["x", "y"], ["1"] * 3]
+    )
+    assert values == [[1.0, 2.0], [3.0, 4.0], [None, 5.0], None, None]
+    assert errors == [False, False, False, True, True]
+
+    values, errors = validate_column(
+        "Spatial.ReferenceValue", convert([[1.0, 2.0], [float("nan"), 3.0]])
+    )
+    assert values[0] == [1.0, 2.0]
+    assert values[1][0] != values[1][0] and values[1][1] == 3.0
+    assert errors == [False, False]
+
+    values, errors = validate_column("Spatial.ReferenceValue", convert([["1", "2"], ["-", "3"]]))
+    assert values == [[1.0, 2.0], [None, 3.0]]
+    assert errors == [False, False]
+
+    values, errors = validate_column(
+        "Spectral.ColorAssignment", convert([["blue", "Green"], ["Other", "-"]])
+    )
+    assert values == [["Blue", "Green"], None]
+    assert errors == [False, True]
+
+    values, errors = validate_column("Type", ["observation", "Chart", "", "Other", 1])
+    assert values == ["Observation", "Chart", None, None, None]
+    assert errors == [False, False, False, True, True]
+
+    values, errors = validate_column("Spectral.ColorAssignment", [["blue", "-"], ["Other"]])
+    assert values == [["Blue", "-"], None]
+    assert errors == [False, True]
+
+    values, errors = validate_column("Title", ["A", "", 1, object()])
+    assert values == ["A", None, "1", None]
+    assert errors == [False, False, False, True]
+
+
+def test_validate_column_invalid_key():
+    with pytest.raises(ValueError, match="Spectacular is not a valid AVM tag"):
+        validate_column("Spectacular", [])
@@ -0,0 +1,97 @@
+import struct
+from io import BytesIO
+
+import pytest
+
+from ..embed import embed_xmp, update_xmp
+from ..extract import extract_xmp
+from ..tiff import XMP_TAG, TIFFHeader, iter_ifds, read_entry_data
+
+PACKET = (
+    b'<?xpacket begin="" id="W5M0MpCehiHzreSzNTczkc9d"?><x:xmpmeta></x:xmpmeta><?xpacket end="w"?>'
+)
+
+
+def make_tiff(byte_order, bigtiff):
+    # Two IFDs, each with a SHORT entry stored in the entry itself and an
+    # ASCII entry stored after the IFD.
+    offset_format = "Q" if bigtiff else "I"
+    count_format = "Q" if bigtiff else "H"
+    inline_size = 8 if bigtiff else 4
+    if bigtiff:
+        header = (b"II+\x00" if byte_order == "<" else b"MM\x00+") + struct.pack(
+            byte_order + "HHQ", 8, 0, 16
+        )
+    else:
+        header = (b"II*\x00" if byte_order == "<" else b"MM\x00*") + struct.pack(
+            byte_order + "I", 8
+        )
+    contents = header
+    for index in range(2):
+        ifd_offset = len(contents)
+        ifd_size = struct.calcsize(count_format) + 2 * (4 + 2 * inline_size) + inline_size
+        text_offset = ifd_offset + ifd_size
+        text = f"Description of image {index}\x00".encode()
+        next_offset = 0 if index == 1 else text_offset + len(text)
+        contents += struct.pack(byte_order + count_format, 2)
+        contents += struct.pack(byte_order + "HH" + offset_format, 256, 3, 1)
+        contents += struct.pack(byte_order + "H", 16) + b"\x00" * (inline_size - 2)
+        contents += struct.pack(byte_order + "HH" + offset_format, 270, 2, len(text))
+        contents += struct.pack(byte_order + offset_format, text_offset)
+        contents += struct.pack(byte_order + offset_format, next_offset)
+        contents += text
+    return contents
+
+
+def read_entries(contents):
+    fileobj = BytesIO(contents)
+    header = TIFFHeader.read(fileobj)
+    return [
+        {entry.tag: read_entry_data(fileobj, header, entry) for entry in entries}
+        for _, entries in iter_ifds(fileobj, header)
+    ]
+
+
+@pytest.mark.parametrize("byte_order", ["<", ">"])
+@pytest.mark.parametrize("bigtiff", [False, True])
+def test_embed(byte_order, bigtiff):
+    contents = make_tiff(byte_order, bigtiff)
+
+    ifds = read_entries(contents)
+    assert len(ifds) == 2
+    assert ifds[0][270] == b"Description of image 0\x00"
+    assert ifds[1][270] == b"Description of image 1\x00"
+
+    # The original file is kept as-is apart from the header, with the packet
+    # and a new first IFD appended at the end
+    tagged = embed_xmp(contents, None, PACKET)
+    header_size = 16 if bigtiff else 8
+    assert tagged[header_size : len(contents)] == contents[header_size:]
+    assert extract_xmp(tagged) == PACKET
+
+    ifds_new = read_entries(tagged)
+    assert ifds_new[0] == {**ifds[0], XMP_TAG: PACKET}
+    assert ifds_new[1] == ifds[1]
+
+    # Embedding again patches the existing entry
+    packet = PACKET.replace(b"x:xmpmeta>", b"x:xmpmeta >")
+    with pytest.warns(UserWarning, match="Discarding existing XMP packet"):
+        retagged = embed_xmp(tagged, None, packet)
+    assert len(retagged) == len(tagged) + len(tagged) % 2 + len(packet)
+    assert extract_xmp(retagged) == packet
+
+    # The packet can be updated in place if it fits
+    fileobj = BytesIO(retagged)
+    assert update_xmp(fileobj, PACKET)
+    assert extract_xmp(fileobj) == PACKET.replace(b"<?xpacket end", b"  <?xpacket end")
+    assert not update_xmp(fileobj, PACKET + b" " * 10)
+
+
+def test_invalid():
+    with pytest.raises(ValueError, match="Unexpected end of file"):
+        extract_xmp(make_tiff("<", False)[:20])
+    loop = bytearray(make_tiff("<", False))
+    loop[4:8] = struct.pack("<I", 8)
+    struct.pack_into("<I", loop, 8 + 2 + 24, 8)
+    with pytest.raises(ValueError, match="loop of IFDs"):
+        extract_xmp(bytes(loop))
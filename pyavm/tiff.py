@@ -0,0 +1,241 @@
+# Pure-python TIFF parser
+
+import struct
+
+# Classic TIFF files start with the byte order followed by 42, and BigTIFF
+# files with the byte order followed by 43.
+
+TIFF_SIGNATURES = {
+    b"II*\x00": ("<", False),
+    b"MM\x00*": (">", False),
+    b"II+\x00": ("<", True),
+    b"MM\x00+": (">", True),
+}
+
+# Tag for XMP packets (XMLPacket), which are stored as BYTE values
+
+XMP_TAG = 700
+
+BYTE = 1
+
+# Size in bytes of a single value for each field type
+
+TYPE_SIZES = {
+    1: 1,  # BYTE
+    2: 1,  # ASCII
+    3: 2,  # SHORT
+    4: 4,  # LONG
+    5: 8,  # RATIONAL
+    6: 1,  # SBYTE
+    7: 1,  # UNDEFINED
+    8: 2,  # SSHORT
+    9: 4,  # SLONG
+    10: 8,  # SRATIONAL
+    11: 4,  # FLOAT
+    12: 8,  # DOUBLE
+    13: 4,  # IFD
+    16: 8,  # LONG8
+    17: 8,  # SLONG8
+    18: 8,  # IFD8
+}
+
+
+class TIFFHeader:
+    """
+    The header of a TIFF file, which gives the byte order, whether the file
+    is a BigTIFF file, and the offset of the first IFD.
+
+    BigTIFF files use 8-byte rather than 4-byte offsets and counts, so the
+    layout of the header and IFDs depends on the variant.
+    """
+
+    @classmethod
+    def read(cls, fileobj):
+        self = cls()
+
+        signature = fileobj.read(4)
+
+        if signature not in TIFF_SIGNATURES:
+            raise ValueError(f"Signature ({signature}) does not match that of a TIFF file")
+
+        self.byte_order, self.bigtiff = TIFF_SIGNATURES[signature]
+        self.signature = signature
+
+        if self.bigtiff:
+            data = fileobj.read(12)
+            if len(data) < 12:
+                raise ValueError("Unexpected end of file while reading TIFF header")
+            offset_size, _, self.ifd_offset = struct.unpack(self.byte_order + "HHQ", data)
+            if offset_size != 8:
+                raise ValueError(f"Unsupported BigTIFF offset size ({offset_size})")
+        else:
+            data = fileobj.read(4)
+            if len(data) < 4:
+                raise ValueError("Unexpected end of file while reading TIFF header")
+            (self.ifd_offset,) = struct.unpack(self.byte_order + "I", data)
+
+        return self
+
+    def pack(self):
+        if self.bigtiff:
+            return self.signature + struct.pack(self.byte_order + "HHQ", 8, 0, self.ifd_offset)
+        else:
+            return self.signature + struct.pack(self.byte_order + "I", self.ifd_offset)
+
+    @property
+    def size(self):
+        return 16 if self.bigtiff else 8
+
+    @property
+    def offset_format(self):
+        # Format of offsets, and of the number of values in IFD entries
+        return "Q" if self.bigtiff else "I"
+
+    @property
+    def count_format(self):
+        # Format of the number of entries in an IFD
+        return "Q" if self.bigtiff else "H"
+
+    @property
+    def entry_size(self):
+        return 20 if self.bigtiff else 12
+
+    @property
+    def max_offset(self):
+        return 2**64 - 1 if self.bigtiff else 2**32 - 1
+
+
+class IFDEntry:
+    """
+    An entry in an IFD.
+
+    The ``value`` attribute contains the raw value field, which holds the
+    values themselves if they fit, and the offset to the values otherwise.
+    The position of the entry in the file is given by the ``offset``
+    attribute.
+    """
+
+    offset = None
+
+    def __init__(self, tag, type, count, value):
+        self.tag = tag
+        self.type = type
+        self.count = count
+        self.value = value
+
+    @classmethod
+    def for_data(cls, header, tag, type, data, offset):
+        """
+        Create an entry for ``data``, which is stored at ``offset`` in the
+        file unless it fits in the entry itself.
+        """
+        inline_size = struct.calcsize(header.offset_format)
+        if len(data) <= inline_size:
+            value = data + b"\x00" * (inline_size - len(data))
+        else:
+            if offset > header.max_offset:
+                raise ValueError("File is too large to be stored as a classic TIFF file")
+            value = struct.pack(header.byte_order + header.offset_format, offset)
+        return cls(tag, type, len(data) // TYPE_SIZES[type], value)
+
+    def pack(self, header):
+        fmt = header.byte_order + "HH" + header.offset_format
+        return struct.pack(fmt, self.tag, self.type, self.count) + self.value
+
+    def data_size(self):
+        return self.count * TYPE_SIZES.get(self.type, 1)
+
+    def data_offset(self, header):
+        """
+        Return the offset of the values in the file, or `None` if the values
+        are stored in the entry itself.
+        """
+        if self.data_size() <= len(self.value):
+            return None
+        return struct.unpack(header.byte_order + header.offset_format, self.value)[0]
+
+
+def read_ifd(fileobj, header, offset):
+    """
+    Read the IFD at ``offset`` in the file.
+
+    Returns the list of entries in the IFD, and the offset of the next IFD
+    (which is zero for the last IFD). The values of the entries are not read.
+    """
+
+    count_size = struct.calcsize(header.count_format)
+
+    fileobj.seek(offset)
+    data = fileobj.read(count_size)
+    if len(data) < count_size:
+        raise ValueError("Unexpected end of file while reading TIFF IFD")
+    (count,) = struct.unpack(header.byte_order + header.count_format, data)
+
+    offset_size = struct.calcsize(header.offset_format)
+
+    size = count * header.entry_size + offset_size
+    data = fileobj.read(size)
+    if len(data) < size:
+        raise ValueError("Unexpected end of file while reading TIFF IFD")
+
+    entries = []
+    fmt = header.byte_order + "HH" + header.offset_format
+    for start in range(0, count * header.entry_size, header.entry_size):
+        tag, type, n = struct.unpack_from(fmt, data, start)
+        entry = IFDEntry(tag, type, n, data[start + 4 + offset_size : start + header.entry_size])
+        entry.offset = offset + count_size + start
+        entries.append(entry)
+
+    (next_offset,) = struct.unpack_from(
+        header.byte_order + header.offset_format, data, size - offset_size
+    )
+
+    return entries, next_offset
+
+
+def iter_ifds(fileobj, header):
+    """
+    Iterate over the IFDs in a TIFF file, following the chain of offsets
+    from the header.
+
+    This yields ``(offset, entries)`` for each IFD, and only the IFDs
+    themselves are read from the file. The file position may be changed
+    between iterations.
+    """
+    offset = header.ifd_offset
+    seen = set()
+    while offset != 0:
+        if offset in seen:
+            raise ValueError("TIFF file contains a loop of IFDs")
+        seen.add(offset)
+        entries, next_offset = read_ifd(fileobj, header, offset)
+        yield offset, entries
+        offset = next_offset
+
+
+def read_entry_data(fileobj, header, entry):
+    """
+    Read the values of an IFD entry as bytes.
+    """
+    size = entry.data_size()
+    offset = entry.data_offset(header)
+    if offset is None:
+        return entry.value[:size]
+    fileobj.seek(offset)
+    data = fileobj.read(size)
+    if len(data) < size:
+        raise ValueError("Unexpected end of file while reading TIFF values")
+    return data
+
+
+def pack_ifd(header, entries, next_offset):
+    """
+    Create an IFD from a list of entries, which are sorted by tag as
+    required by the specification.
+    """
+    entries = sorted(entries, key=lambda entry: entry.tag)
+    return b"".join(
+        [struct.pack(header.byte_order + header.count_format, len(entries))]
+        + [entry.pack(header) for entry in entries]
+        + [struct.pack(header.byte_order + header.offset_format, next_offset)]
+    )
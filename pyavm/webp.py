@@ -0,0 +1,91 @@
+# Pure-python WebP (RIFF) parser
+
+import struct
+
+RIFF_SIGNATURE = b"RIFF"
+
+WEBP_SIGNATURE = b"WEBP"
+
+# Chunk containing XMP packets
+
+XMP_CHUNK = b"XMP "
+
+# Flags in the VP8X chunk, which is required for files with metadata
+
+ICC_FLAG = 0x20
+ALPHA_FLAG = 0x10
+EXIF_FLAG = 0x08
+XMP_FLAG = 0x04
+ANIMATION_FLAG = 0x02
+
+
+def read_header(fileobj):
+    """
+    Read the RIFF header of a WebP file, and return the size of the file
+    according to the header.
+    """
+    header = fileobj.read(12)
+    if len(header) < 12 or header[:4] != RIFF_SIGNATURE or header[8:12] != WEBP_SIGNATURE:
+        raise ValueError(f"Signature ({header[:12]}) does not match that of a WebP file")
+    return struct.unpack("<I", header[4:8])[0] + 8
+
+
+def iter_chunks(fileobj, end):
+    """
+    Iterate over the chunks in a WebP file, without reading the chunk data.
+
+    The file should be positioned after the RIFF header. This yields
+    ``(offset, size, fourcc)`` for each chunk, where ``offset`` is the
+    position of the start of the chunk header in the file and ``size`` is
+    the size of the chunk data, excluding the header and padding byte. The
+    file position may be changed between iterations.
+    """
+    offset = fileobj.tell()
+    while offset + 8 <= end:
+        fileobj.seek(offset)
+        header = fileobj.read(8)
+        if len(header) < 8:
+            raise ValueError("Unexpected end of file while reading WebP chunk")
+        fourcc, size = struct.unpack("<4sI", header)
+        yield offset, size, fourcc
+        offset += 8 + size + size % 2
+
+
+def chunk(fourcc, data):
+    """
+    Create a chunk, including the padding byte for data of odd length.
+    """
+    return struct.pack("<4sI", fourcc, len(data)) + data + b"\x00" * (len(data) % 2)
+
+
+def vp8x_chunk(flags, width, height):
+    """
+    Create a VP8X chunk for a canvas of the given dimensions.
+    """
+    data = (
+        struct.pack("<I", flags)
+        + struct.pack("<I", width - 1)[:3]
+        + struct.pack("<I", height - 1)[:3]
+    )
+    return chunk(b"VP8X", data)
+
+
+def image_info(fourcc, data):
+    """
+    Return the width and height of the image in a VP8 or VP8L chunk, and
+    whether it has an alpha channel.
+    """
+    if fourcc == b"VP8 ":
+        # Frame tag followed by start code and 14-bit dimensions
+        if len(data) < 10 or data[3:6] != b"\x9d\x01\x2a":
+            raise ValueError("Invalid VP8 chunk")
+        width, height = struct.unpack("<HH", data[6:10])
+        return width & 0x3FFF, height & 0x3FFF, False
+    elif fourcc == b"VP8L":
+        # Signature followed by 14-bit dimensions (minus one) and alpha flag
+        if len(data) < 5 or data[0] != 0x2F:
+            raise ValueError("Invalid VP8L chunk")
+        (bits,) = struct.unpack("<I", data[1:5])
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, bool(bits >> 28 & 1)
+    else:
+        raise ValueError(f"Unexpected WebP image chunk: {fourcc}")